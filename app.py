@@ -1,6 +1,6 @@
 import os
-import json
 import base64
+import threading
 import requests
 import streamlit as st
 from dotenv import load_dotenv, set_key
@@ -8,11 +8,14 @@ import assist
 from rembg import remove
 from PIL import Image
 
-# Import your controller module
-try:
-    import controller
-except ModuleNotFoundError:
-    print('Controller modules not found. Pump control will be disabled for WebUI')
+# Pump jobs go through the resident pour service (pour_service.py), which
+# owns the GPIO pins. It falls back to the controller in-process if not running.
+import pour_service
+# Pump assignments and the cocktail menu live in the shared SQLite store.
+import store
+import recipes
+import menu_matrix
+import inventory
 
 # Load .env variables
 load_dotenv()
@@ -38,7 +41,6 @@ if not os.getenv("OZ_CALIBRATION"):
 
 # ---------- Global Setup ----------
 CONFIG_FILE = "pump_config.json"
-COCKTAILS_FILE = "cocktails.json"
 LOGO_FOLDER = "drink_logos"
 
 if not os.path.exists(LOGO_FOLDER):
@@ -50,34 +52,32 @@ if "selected_cocktail" not in st.session_state:
 
 # ---------- Helper Functions ----------
 def load_saved_config():
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            st.error(f"Error loading configuration: {e}")
+    try:
+        return store.get_pump_config()
+    except Exception as e:
+        st.error(f"Error loading configuration: {e}")
     return {}
 
 def save_config(data):
     try:
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+        # e.g. "Pump 4: 'Tuquila' will be matched as Tequila"
+        for note in store.save_pump_config(data):
+            st.info(note)
     except Exception as e:
         st.error(f"Error saving configuration: {e}")
 
 def load_cocktails():
-    if os.path.exists(COCKTAILS_FILE):
-        try:
-            with open(COCKTAILS_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            st.error(f"Error loading cocktails: {e}")
+    try:
+        return store.get_cocktails()
+    except Exception as e:
+        st.error(f"Error loading cocktails: {e}")
     return {}
 
 def save_cocktails(data):
     try:
-        with open(COCKTAILS_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+        # Recipes are validated here, so bad units show up now rather than mid-pour
+        for problem in store.save_cocktails(data):
+            st.warning(problem)
     except Exception as e:
         st.error(f"Error saving cocktails: {e}")
 
@@ -85,6 +85,72 @@ def get_safe_name(name):
     """Convert a cocktail name to a safe filename-friendly string."""
     return name.lower().replace(" ", "_")
 
+@st.cache_resource
+def get_pour_status():
+    """Shared across reruns: the background pour thread and its last result."""
+    return {"thread": None, "label": None, "result": None, "error": None}
+
+def start_pour(label, pour_fn):
+    """
+    Run `pour_fn` on a background thread so the page (and its Stop button)
+    stays responsive while the pumps run.
+    """
+    status = get_pour_status()
+    if status["thread"] and status["thread"].is_alive():
+        st.warning(f"Already pouring {status['label']}. Wait for it to finish or press Stop.")
+        return
+
+    def run():
+        try:
+            status["result"] = pour_fn()
+        except Exception as e:
+            status["error"] = str(e)
+
+    status.update(label=label, result=None, error=None)
+    status["thread"] = threading.Thread(target=run, daemon=True)
+    status["thread"].start()
+    st.info(f"Pouring {label}...")
+
+# ---------- Emergency Stop ----------
+with st.sidebar:
+    st.header("Pumps")
+    pour_status = get_pour_status()
+    if st.button("STOP ALL PUMPS", type="primary", use_container_width=True):
+        try:
+            pour_service.emergency_stop()
+            if pour_status["thread"]:
+                pour_status["thread"].join(timeout=1)
+            st.warning("All pumps stopped.")
+        except Exception as e:
+            st.error(f"Error stopping pumps: {e}")
+    if pour_status["thread"] and pour_status["thread"].is_alive():
+        st.info(f"Pouring {pour_status['label']}...")
+    elif pour_status["error"]:
+        st.error(f"Error while pouring {pour_status['label']}: {pour_status['error']}")
+    elif pour_status["result"]:
+        result = pour_status["result"]
+        stopped = result.get("cancelled")
+        if result.get("short"):
+            short = ", ".join(
+                f"{entry.get('ingredient', label)} on {label} (needs {entry['needed_oz']:.2f} oz, "
+                f"{entry['remaining_oz']:.2f} oz left)"
+                for label, entry in result["short"].items()
+            )
+            st.error(f"{pour_status['label']} was not poured, not enough left: {short}. Refill under Settings -> Inventory.")
+        elif stopped and "poured" in result:
+            poured = ", ".join(f"{oz:.2f} oz {name}" for name, oz in result["poured"].items()) or "nothing"
+            st.warning(f"{pour_status['label']} was stopped. Already poured: {poured}.")
+        elif stopped:
+            st.warning(f"{pour_status['label']} was stopped during glass {stopped['glass']} "
+                       f"({result['glasses']} drinks finished).")
+        elif "glasses" in result:
+            st.success(
+                f"Poured {result['glasses']} drinks in {result['elapsed']:.0f} seconds "
+                f"(about {result['separate_estimate']:.0f} seconds one ingredient at a time)."
+            )
+        else:
+            st.success(f"Poured {pour_status['label']} in {result['elapsed']:.0f} seconds.")
+
 # ---------- Tabs ----------
 tabs = st.tabs(["My Bar", "Settings", "Cocktail Menu"])
 
@@ -129,13 +195,16 @@ with tabs[0]:
 
     if st.button("Generate Recipes"):
         pump_to_drink = {pump: drink for pump, drink in pump_inputs.items() if drink.strip()}
-        # Save the pump configuration to JSON
+        # Save the pump configuration
         save_config(pump_to_drink)
 
         st.markdown(f"<p style='text-align: center;'>Pump configuration: {pump_to_drink}</p>", unsafe_allow_html=True)
         
         # Ask AI to generate cocktails from these pumps + bartender requests
         cocktails_json = assist.generate_cocktails(pump_to_drink, bartender_requests)
+        if "error" in cocktails_json:
+            st.error(f"Error generating cocktails: {cocktails_json['error']}")
+            st.stop()
         save_cocktails(cocktails_json)
         
         st.markdown("<h2 style='text-align: center;'>Generating Cocktail Logos...</h2>", unsafe_allow_html=True)
@@ -184,21 +253,49 @@ with tabs[1]:
 
     st.subheader("Prime Pumps")
     primetime = st.number_input("Priming Time", step=1, value=10)
+    current_budget = st.number_input(
+        "Current budget (amps)",
+        min_value=0.5,
+        step=0.1,
+        value=float(os.getenv("CURRENT_BUDGET_AMPS", 3.2)),
+        help="Prime and clean run as many pumps at once as fit in this budget.",
+    )
+    with st.expander("Per-pump times"):
+        st.caption("Leave at 0 to use the time above.")
+        pump_overrides = {}
+        override_cols = st.columns(2)
+        for i in range(1, 13):
+            pump_name = f"Pump {i}"
+            with override_cols[(i - 1) // 6]:
+                seconds = st.number_input(pump_name, min_value=0, step=1, value=0, key=f"duration_{pump_name}")
+            if seconds:
+                pump_overrides[pump_name] = seconds
     if st.button("Prime Pumps"):
         st.info(f"Priming all pumps for {primetime} seconds each...")
         try:
-            controller.prime_pumps(duration=primetime)
-            st.success("Pumps primed successfully!")
+            elapsed = pour_service.prime_pumps(duration=primetime, durations=pump_overrides, current_budget=current_budget)
+            sequential = sum(pump_overrides.get(f"Pump {i}", primetime) for i in range(1, 13))
+            st.success(f"Pumps primed successfully in {elapsed:.1f} seconds (one at a time would take {sequential} seconds).")
+            set_key(".env", "CURRENT_BUDGET_AMPS", str(current_budget))
         except Exception as e:
             st.error(f"Error priming pumps: {e}")
 
     # NEW: Clean Pumps
     st.subheader("Clean Pumps")
+    cleantime = st.number_input("Cleaning Time", step=1, value=10)
+    pulse_clean = st.checkbox("Pulse forward/reverse")
+    pulse_time = st.number_input("Pulse length (seconds)", min_value=0.5, step=0.5, value=1.0, disabled=not pulse_clean)
     if st.button("Clean Pumps"):
-        st.info("Reversing all pumps for 10 seconds each (cleaning mode)...")
+        st.info(f"Reversing all pumps for {cleantime} seconds each (cleaning mode)...")
         try:
-            controller.clean_pumps(duration=10)
-            st.success("All pumps reversed (cleaned).")
+            elapsed = pour_service.clean_pumps(
+                duration=cleantime,
+                durations=pump_overrides,
+                current_budget=current_budget,
+                pulse=pulse_time if pulse_clean else None,
+            )
+            sequential = sum(pump_overrides.get(f"Pump {i}", cleantime) for i in range(1, 13))
+            st.success(f"All pumps cleaned in {elapsed:.1f} seconds (one at a time would take {sequential} seconds).")
         except Exception as e:
             st.error(f"Error cleaning pumps: {e}")
 
@@ -208,6 +305,71 @@ with tabs[1]:
     if st.button("Save Motor Calibration"):
         set_key(".env", "OZ_CALIBRATION", str(key_input))
 
+    # What-if: which drinks a pump swap gains or loses
+    st.subheader("What If I Swap a Pump?")
+    matrix = menu_matrix.current()
+    if matrix.pumps:
+        swap_cols = st.columns(2)
+        swap_pump = swap_cols[0].selectbox("Pump", matrix.pumps)
+        swap_ingredient = swap_cols[1].text_input("New ingredient", value=matrix.pump_config.get(swap_pump, ""))
+        swapped = matrix.what_if({swap_pump: swap_ingredient})
+        gained = [name for name in swapped.available() if not matrix.is_feasible(name)]
+        lost = [name for name in matrix.available() if not swapped.is_feasible(name)]
+        st.write(f"{int(swapped.feasible.sum())} of {len(matrix)} drinks could be made.")
+        if gained:
+            st.write("Gained: " + ", ".join(gained))
+        if lost:
+            st.write("Lost: " + ", ".join(lost))
+
+    # Inventory: what is left behind each pump
+    st.subheader("Inventory")
+    st.caption("Enter a pump's bottle to track it. Orders a tracked pump can't cover are "
+               f"refused before pouring (INVENTORY_CHECK={inventory.get_check_mode()}).")
+    levels = inventory.forecast()
+    assigned_pumps = {label: ingredient for label, ingredient in store.get_pump_config().items() if ingredient}
+    for label, ingredient in assigned_pumps.items():
+        level = levels.get(label)
+        cols = st.columns([3, 1, 1])
+        if level is None:
+            cols[0].write(f"{label} ({ingredient}): not tracked")
+        else:
+            text = f"{label} ({ingredient}): {level['remaining_oz']:.1f} oz left"
+            if level["capacity_oz"]:
+                text += f" of {level['capacity_oz']:.1f} oz"
+            if level["hours_left"] is not None:
+                text += f", about {level['hours_left']:.1f} hours at {level['rate_oz_per_hour']:.1f} oz/hour"
+            (cols[0].warning if level["low"] else cols[0].write)(text)
+            if level["capacity_oz"] and cols[1].button("Refill", key=f"refill_{label}"):
+                store.set_inventory(label, level["capacity_oz"])
+                st.rerun()
+            if cols[2].button("Stop tracking", key=f"untrack_{label}"):
+                store.untrack_inventory(label)
+                st.rerun()
+    if assigned_pumps:
+        inventory_cols = st.columns(3)
+        inventory_pump = inventory_cols[0].selectbox("Pump", list(assigned_pumps), key="inventory_pump")
+        bottle_oz = inventory_cols[1].number_input("Bottle size (oz)", min_value=0.0, step=1.0, value=25.4)
+        remaining_oz = inventory_cols[2].number_input("Left in it (oz)", min_value=0.0, step=1.0, value=25.4)
+        if st.button("Save Bottle"):
+            store.set_inventory(inventory_pump, remaining_oz, bottle_oz or None)
+            st.success(f"{inventory_pump}: {remaining_oz:.1f} oz left.")
+
+    # Ingredient Aliases
+    st.subheader("Ingredient Aliases")
+    st.caption("Other names for an ingredient, so recipes that say e.g. 'Lime' pour from the Lime Juice pump.")
+    for alias, ingredient in store.get_aliases().items():
+        cols = st.columns([3, 1])
+        cols[0].write(f"{alias} → {ingredient}")
+        if cols[1].button("Remove", key=f"remove_alias_{alias}"):
+            store.delete_alias(alias)
+            st.rerun()
+    alias_cols = st.columns(2)
+    new_alias = alias_cols[0].text_input("Name in recipes")
+    new_target = alias_cols[1].text_input("Ingredient on the pump")
+    if st.button("Save Alias") and new_alias.strip() and new_target.strip():
+        store.save_alias(new_alias, new_target)
+        st.success(f"'{new_alias}' now pours as {store.ingredient_index().resolve(new_alias)}.")
+
     # Clear OpenAI Key
     st.subheader("(Re)set OpenAI API Key")
     ai_key = st.text_input("OpenAI API Key")
@@ -218,25 +380,15 @@ with tabs[1]:
 with tabs[2]:
     st.markdown("<h1 style='text-align: center;'>Cocktail Menu</h1>", unsafe_allow_html=True)
 
-    # Load the cocktails from file
-    cocktail_data = {}
-    if os.path.exists(COCKTAILS_FILE):
-        try:
-            with open(COCKTAILS_FILE, "r") as f:
-                cocktail_data = json.load(f)
-        except Exception as e:
-            st.error(f"Error loading cocktails: {e}")
+    # Load the cocktails from the store
+    cocktail_data = load_cocktails()
 
     if st.session_state.selected_cocktail:
         # USER IS VIEWING A COCKTAIL DETAIL PAGE
         safe_name = st.session_state.selected_cocktail
-        selected_cocktail = None
-
-        # Find the matching cocktail in the JSON
-        for c in cocktail_data.get("cocktails", []):
-            if get_safe_name(c.get("normal_name", "")) == safe_name:
-                selected_cocktail = c
-                break
+        # The compiled recipe carries every amount in oz, already parsed
+        recipe = store.get_recipe(safe_name)
+        selected_cocktail = recipe.as_dict() if recipe else None
 
         if selected_cocktail is None:
             st.error("Cocktail not found.")
@@ -260,23 +412,21 @@ with tabs[2]:
             # Show the recipe
             st.markdown("<h2 style='text-align: center;'>Recipe</h2>", unsafe_allow_html=True)
             recipe_adjustments = {}
-            for ingredient, measurement in selected_cocktail.get("ingredients", {}).items():
-                parts = measurement.split()
-                try:
-                    default_value = float(parts[0])
-                    unit = " ".join(parts[1:]) if len(parts) > 1 else ""
-                except:
-                    default_value = 1.0
-                    unit = measurement
+            for ingredient, measurement, oz in zip(recipe.ingredients, recipe.measurements, recipe.amounts):
+                if oz is None:
+                    st.warning(f"{ingredient} ({measurement}): unknown amount, it will not be poured.")
+                    recipe_adjustments[ingredient] = measurement
+                    continue
 
                 value = st.slider(
-                    f"{ingredient} ({measurement})",
+                    f"{ingredient} ({measurement}, oz)",
                     min_value=0.0,
-                    max_value=default_value * 4,
-                    value=default_value,
+                    max_value=max(oz * 4, 1.0),
+                    value=oz,
                     step=0.1,
                 )
-                recipe_adjustments[ingredient] = f"{value} {unit}".strip()
+                # Untouched sliders keep the original text so the cached pour plan still applies
+                recipe_adjustments[ingredient] = measurement if value == oz else recipes.format_oz(value)
 
             st.markdown("<h3 style='text-align: center;'><strong>Adjusted Recipe</strong></h3>", unsafe_allow_html=True)
             st.json(recipe_adjustments)
@@ -284,34 +434,24 @@ with tabs[2]:
             cols = st.columns([1, 1])
             with cols[0]:
                 if st.button("Save Recipe"):
-                    updated = False
-                    # Overwrite the JSON with new measurements
-                    for idx, cktl in enumerate(cocktail_data.get("cocktails", [])):
-                        if get_safe_name(cktl.get("normal_name", "")) == safe_name:
-                            cocktail_data["cocktails"][idx]["ingredients"] = recipe_adjustments
-                            updated = True
-                            break
-                    if updated:
-                        try:
-                            with open(COCKTAILS_FILE, "w") as f:
-                                json.dump(cocktail_data, f, indent=2)
-                            st.success("Recipe saved!")
-                        except Exception as e:
-                            st.error(f"Error saving recipe: {e}")
-                    else:
-                        st.error("Failed to update recipe.")
+                    # Only this cocktail's row is rewritten, in one transaction
+                    try:
+                        for problem in store.save_cocktail(dict(selected_cocktail, ingredients=recipe_adjustments)):
+                            st.warning(problem)
+                        st.success("Recipe saved!")
+                    except Exception as e:
+                        st.error(f"Error saving recipe: {e}")
 
             with cols[1]:
                 if st.button("Pour"):
-                    st.info("Pouring a single serving...")
-                    # We call controller.make_drink with single
+                    # We call pour_service.make_drink with single
                     # Build a dictionary that matches what the controller expects
-                    # The 'selected_cocktail' is already a dict from cocktails.json
+                    # The 'selected_cocktail' is already a dict from the menu
                     # so we can pass it directly.
-                    try:
-                        controller.make_drink(CONFIG_FILE, selected_cocktail, single_or_double="single")
-                    except Exception as e:
-                        st.error(f"Error while pouring: {e}")
+                    start_pour(
+                        f"a single {selected_cocktail.get('normal_name', 'drink')}",
+                        lambda: pour_service.make_drink(CONFIG_FILE, selected_cocktail, single_or_double="single", source="webui"),
+                    )
 
             # Back to gallery
             if st.button("Back to Menu"):
@@ -321,6 +461,11 @@ with tabs[2]:
     else:
         # GALLERY VIEW
         cocktails_list = cocktail_data.get("cocktails", [])
+        # Drinks the current pumps can't make are hidden unless asked for
+        matrix = menu_matrix.current()
+        unavailable = {c.get("normal_name", "") for c in cocktails_list if matrix.is_feasible(c.get("normal_name", "")) is False}
+        if unavailable and not st.checkbox(f"Show {len(unavailable)} drink(s) the current pumps can't make"):
+            cocktails_list = [c for c in cocktails_list if c.get("normal_name", "") not in unavailable]
         if cocktails_list:
             for cocktail in cocktails_list:
                 normal_name = cocktail.get("normal_name", "unknown_drink")
@@ -328,6 +473,9 @@ with tabs[2]:
                 filename = os.path.join(LOGO_FOLDER, f"{safe_cname}.png")
 
                 st.markdown(f"<h3 style='text-align: center;'>{normal_name}</h3>", unsafe_allow_html=True)
+                if normal_name in unavailable:
+                    missing = ", ".join(matrix.missing(normal_name)) or "an ingredient with an unknown amount"
+                    st.markdown(f"<p style='text-align: center;'>Can't be made: needs {missing}</p>", unsafe_allow_html=True)
                 if os.path.exists(filename):
                     with open(filename, "rb") as image_file:
                         encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
@@ -348,10 +496,39 @@ with tabs[2]:
                     if st.button("Pour", key=f"pour_{safe_cname}"):
                         # If they pour from the gallery, we can do single as well,
                         # but we have no way to adjust recipe first. We'll just pour the default recipe.
-                        st.info(f"Pouring a single serving of {normal_name} ...")
-                        try:
-                            controller.make_drink(CONFIG_FILE, cocktail, single_or_double="single")
-                        except Exception as e:
-                            st.error(f"Error while pouring: {e}")
+                        start_pour(
+                            f"a single {normal_name}",
+                            lambda cocktail=cocktail: pour_service.make_drink(CONFIG_FILE, cocktail, single_or_double="single", source="webui"),
+                        )
+
+            # ROUND ORDER: pour several drinks back to back in one go
+            st.markdown("<h2 style='text-align: center;'>Pour a Round</h2>", unsafe_allow_html=True)
+            round_orders = []
+            for cocktail in cocktails_list:
+                normal_name = cocktail.get("normal_name", "unknown_drink")
+                safe_cname = get_safe_name(normal_name)
+                round_cols = st.columns([3, 2, 2])
+                with round_cols[0]:
+                    st.write(normal_name)
+                with round_cols[1]:
+                    size = st.selectbox("Size", ["single", "double"], key=f"round_size_{safe_cname}", label_visibility="collapsed")
+                with round_cols[2]:
+                    count = st.number_input("Count", min_value=0, step=1, value=0, key=f"round_count_{safe_cname}", label_visibility="collapsed")
+                if count:
+                    round_orders.append((cocktail, size, int(count)))
+            if round_orders:
+                counts = {}
+                for cocktail, size, count in round_orders:
+                    name = cocktail.get("normal_name", "")
+                    counts[name] = counts.get(name, 0) + count * (2 if size == "double" else 1)
+                used = {pump: oz for pump, oz in matrix.usage(counts).items() if oz}
+                st.caption("This round uses: " + ", ".join(f"{matrix.pump_config[pump]} {oz:g} oz" for pump, oz in used.items()))
+            swap_time = st.number_input("Seconds to swap glasses", min_value=0, step=1, value=4)
+            if st.button("Pour Round", disabled=not round_orders):
+                total = sum(count for _, _, count in round_orders)
+                start_pour(
+                    f"a round of {total} drinks",
+                    lambda: pour_service.make_round(CONFIG_FILE, round_orders, swap_seconds=swap_time, source="webui"),
+                )
         else:
             st.markdown("<p style='text-align: center;'>No recipes generated yet. Please use the 'My Bar' tab to generate recipes.</p>", unsafe_allow_html=True)
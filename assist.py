@@ -1,7 +1,9 @@
 import json
-from pydantic import BaseModel
 import os
 from openai import OpenAI, OpenAIError
+# Pydantic model for the generated menu; the response is validated against it before it is saved
+from pydantic import ValidationError
+from recipes import CocktailResponse, error_text
 
 def get_client():
     api_key = os.getenv("OPENAI_API_KEY")
@@ -9,15 +11,6 @@ def get_client():
         raise OpenAIError("The api_key client option must be set either by passing api_key to the client or by setting the OPENAI_API_KEY environment variable")
     return OpenAI(api_key=api_key)
 
-# Pydantic models for documentation
-class Cocktail(BaseModel):
-    normal_name: str
-    fun_name: str
-    ingredients: dict
-
-class CocktailResponse(BaseModel):
-    cocktails: list[Cocktail]
-
 def generate_cocktails(pump_to_drink: dict, requests_for_bartender: str = "") -> dict:
     prompt = (
         "You are a creative cocktail mixologist. Based on the following pump configuration, "
@@ -60,8 +53,10 @@ def generate_cocktails(pump_to_drink: dict, requests_for_bartender: str = "") ->
             response_format={"type": "json_object"},
         )
         json_output = completion.choices[0].message.content
-        data = json.loads(json_output)
-        return data
+        data = CocktailResponse.model_validate(json.loads(json_output))
+        return data.model_dump()
+    except ValidationError as e:
+        return {"error": f"The generated menu is not valid: {error_text(e)}"}
     except Exception as e:
         return {"error": str(e)}
 
@@ -0,0 +1,239 @@
+# bench.py
+"""
+Throughput and latency benchmarks for the whole pour path.
+
+Runs controller.make_drink, controller.prime_pumps and interface.parse_drink
+against the simulated GPIO backend (hardware.SimulatedBackend), using
+generated cocktail menus of 10, 1k and 100k entries. Measures:
+
+  - menu_save_s           time to save the menu to the store (one transaction)
+  - menu_load_s           time to read the whole menu back from the store
+  - plan_build_s          cold compile of every pour plan (pour_plans.get_plans)
+  - parse_drink_s         mean interface.parse_drink lookup (worst-case entry)
+  - tap_to_pump_s         real time from make_drink() call to first pump on
+                          (p50/p95/max over the sampled drinks)
+  - make_drink_overhead_s real CPU time per drink outside of pump waits
+  - drinks_per_hour       from the simulated pour time per drink
+  - prime_cycle_s         simulated prime cycle time and its real overhead
+
+Results are written as JSON so runs can be compared between releases:
+
+    python bench.py --output bench_results.json
+    python bench.py --compare bench_results.json   # flag regressions
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import contextlib
+
+os.environ.setdefault("TIPSY_BACKEND", "sim")
+
+import controller
+import hardware
+import pour_plans
+import store
+import telemetry
+
+DEFAULT_SIZES = [10, 1000, 100000]
+DEFAULT_DRINKS = 200
+# A metric counts as a regression if it gets this much worse than the baseline.
+REGRESSION_THRESHOLD = 0.20
+
+# Metrics where a bigger number is better; everything else is a time.
+HIGHER_IS_BETTER = ("drinks_per_hour",)
+
+
+def generate_menu(size, pump_config, seed=0):
+    """A {"cocktails": [...]} menu (as saved by store.save_cocktails) with `size` random recipes."""
+    rng = random.Random(seed)
+    ingredients = list(pump_config.values()) + ["Soda Water", "Bitters"]  # a few unmapped
+    cocktails = []
+    for i in range(size):
+        picked = rng.sample(ingredients, rng.randint(2, 5))
+        cocktails.append({
+            "normal_name": f"Bench Cocktail {i}",
+            "fun_name": f"Benchmark #{i}",
+            "ingredients": {name: f"{rng.choice([0.25, 0.5, 1, 1.5, 2])} oz" for name in picked},
+        })
+    return {"cocktails": cocktails}
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def bench_menu(size, pump_config_path, pump_config, drinks):
+    """Run every benchmark for one menu size and return its results."""
+    menu = generate_menu(size, pump_config)
+    results = {"size": size}
+
+    start = time.perf_counter()
+    store.save_cocktails(menu)
+    results["menu_save_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.get_cocktails()
+    results["menu_load_s"] = time.perf_counter() - start
+
+    pour_plans.invalidate()
+    start = time.perf_counter()
+    pour_plans.get_plans(pump_config_path)
+    results["plan_build_s"] = time.perf_counter() - start
+
+    results["parse_drink_s"] = bench_parse_drink(menu)
+
+    backend = controller.backend
+    rng = random.Random(size)
+    samples = [rng.choice(menu["cocktails"]) for _ in range(drinks)]
+    latencies = []
+    overheads = []
+    poured = 0.0
+    for recipe in samples:
+        first_on = []
+
+        def on_event(event):
+            if event["event"] == "pump_start" and not first_on:
+                first_on.append(time.perf_counter())
+
+        backend.reset()
+        start = time.perf_counter()
+        controller.make_drink(pump_config_path, recipe, "single", on_event=on_event)
+        overheads.append(time.perf_counter() - start)
+        if first_on:
+            latencies.append(first_on[0] - start)
+        poured += backend.monotonic()
+
+    results["tap_to_pump_s"] = {
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "max": max(latencies) if latencies else 0.0,
+    }
+    results["make_drink_overhead_s"] = sum(overheads) / len(overheads)
+    results["drinks_per_hour"] = 3600 / (poured / drinks) if poured else 0.0
+    return results
+
+
+def bench_parse_drink(menu, repeats=5):
+    """Mean time for interface.parse_drink to find the last cocktail on the menu."""
+    try:
+        import interface
+    except ModuleNotFoundError as e:
+        print(f"Skipping parse_drink benchmark ({e}).")
+        return None
+    last = menu["cocktails"][-1]["normal_name"].lower().replace(" ", "_") + ".png"
+    start = time.perf_counter()
+    for _ in range(repeats):
+        interface.parse_drink(last)
+    return (time.perf_counter() - start) / repeats
+
+
+def bench_prime(duration=10):
+    backend = controller.backend
+    backend.reset()
+    start = time.perf_counter()
+    cycle = controller.prime_pumps(duration)
+    return {"prime_cycle_s": cycle, "prime_overhead_s": time.perf_counter() - start}
+
+
+def run(sizes, drinks, pump_config_path):
+    if not isinstance(controller.backend, hardware.SimulatedBackend):
+        controller.set_backend(hardware.SimulatedBackend())
+    with open(pump_config_path, "r") as f:
+        pump_config = json.load(f)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "oz_calibration": pour_plans.get_oz_calibration(),
+        "menus": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, "w") as devnull:
+        # Keep benchmark pours and menus out of the real telemetry log and store.
+        telemetry.TELEMETRY_FILE = os.path.join(workdir, "telemetry.jsonl")
+        db_file = store.DB_FILE
+        store.DB_FILE = os.path.join(workdir, "bench.db")
+        store.seed(store.DB_FILE)
+        with contextlib.redirect_stdout(devnull):
+            store.save_pump_config(pump_config)
+        for size in sizes:
+            print(f"Benchmarking menu of {size} cocktails...", file=sys.stderr)
+            with contextlib.redirect_stdout(devnull):
+                report["menus"].append(bench_menu(size, pump_config_path, pump_config, drinks))
+        with contextlib.redirect_stdout(devnull):
+            report.update(bench_prime())
+        telemetry.flush()
+        store.DB_FILE = db_file
+    pour_plans.invalidate()
+    return report
+
+
+def _flatten(report):
+    """{"size=10.menu_load_s": value, ...} for comparing two reports."""
+    flat = {}
+    for menu in report.get("menus", []):
+        for key, value in menu.items():
+            if key == "size":
+                continue
+            if isinstance(value, dict):
+                for sub, sub_value in value.items():
+                    flat[f"size={menu['size']}.{key}.{sub}"] = sub_value
+            else:
+                flat[f"size={menu['size']}.{key}"] = value
+    for key in ("prime_cycle_s", "prime_overhead_s"):
+        if key in report:
+            flat[key] = report[key]
+    return flat
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Print metric changes and return the list of regressed metric names."""
+    old, new = _flatten(baseline), _flatten(current)
+    regressions = []
+    for key in sorted(new):
+        if key not in old or not old[key] or new[key] is None:
+            continue
+        change = (new[key] - old[key]) / old[key]
+        worse = -change if any(name in key for name in HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > threshold:
+            flag = "  <-- REGRESSION"
+            regressions.append(key)
+        print(f"{key:45s} {old[key]:12.6g} -> {new[key]:12.6g} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Tipsy pour path on simulated GPIO.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated menu sizes (default: 10,1000,100000)")
+    parser.add_argument("--drinks", type=int, default=DEFAULT_DRINKS, help="drinks poured per menu size")
+    parser.add_argument("--pump-config", default="pump_config.json")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = run(sizes, args.drinks, args.pump_config)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if compare(baseline, report):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# bench_ui.py
+"""
+Headless render benchmark for the touchscreen UI (interface.py).
+
+Runs interface.run_interface on SDL's dummy video driver in a scratch
+directory with a generated menu of N cocktails and logos, replays a
+scripted sequence of swipes, snap-backs and single/double taps, and writes
+the frame_profiler report (per-phase p50/p95/p99 and histograms, time to
+first frame, input-to-photon latency of the replayed events) as JSON:
+
+    python bench_ui.py --logos 300 --output ui_results.json
+
+Pours triggered by taps run in-process on the simulated GPIO backend, never
+through a running pour service, so this is safe to run on the Pi itself.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS = ["tipsy.png", "single.png", "double.png", "pouring.png", "loading.png"]
+
+# Display, GPIO and service set-up must happen before pygame/pour_service are imported.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ["TIPSY_BACKEND"] = "sim"
+
+DEFAULT_LOGOS = 300
+DEFAULT_SWIPES = 30
+STEP_PAUSE = 0.45  # seconds between scripted gestures (longer than a swipe slide)
+MOTION_HZ = 60     # rate of replayed drag motion events
+
+
+def make_workdir(workdir, logos, seed=0):
+    """Fill `workdir` with the UI assets and a generated menu of `logos` cocktails."""
+    import pygame
+    import bench
+    import store
+    import telemetry
+
+    os.environ["TIPSY_SOCKET"] = os.path.join(workdir, "no-service.sock")
+    os.environ["LOGO_CACHE_DIR"] = os.path.join(workdir, ".logo_cache")
+    # Keep benchmark pours and menus out of the real telemetry log and store.
+    telemetry.TELEMETRY_FILE = os.path.join(workdir, "telemetry.jsonl")
+    store.DB_FILE = os.path.join(workdir, "tipsy.db")
+    store.seed(store.DB_FILE)
+    for name in ASSETS:
+        source = os.path.join(REPO_DIR, name)
+        if os.path.exists(source):
+            os.symlink(source, os.path.join(workdir, name))
+    with open(os.path.join(REPO_DIR, "pump_config.json"), "r") as f:
+        pump_config = json.load(f)
+    menu = bench.generate_menu(logos, pump_config, seed=seed)
+    store.save_pump_config(pump_config)
+    store.save_cocktails(menu)
+
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(workdir, "drink_logos"))
+    for cocktail in menu["cocktails"]:
+        logo = pygame.Surface((512, 512), pygame.SRCALPHA)
+        for _ in range(12):
+            color = [rng.randint(0, 255) for _ in range(3)] + [255]
+            pygame.draw.circle(logo, color, (rng.randint(0, 511), rng.randint(0, 511)), rng.randint(20, 160))
+        filename = cocktail["normal_name"].lower().replace(" ", "_") + ".png"
+        pygame.image.save(logo, os.path.join(workdir, "drink_logos", filename))
+
+
+def script(swipes, seed=0):
+    """Gestures to replay: ("swipe"/"flick", from_x, to_x), ("tap", x, y) and ("quit",)."""
+    rng = random.Random(seed)
+    steps = []
+    for i in range(swipes):
+        if i % 10 == 9:
+            steps.append(("tap", 125, 360) if i % 20 == 9 else ("tap", 595, 360))  # single / double
+        elif i % 5 == 4:
+            steps.append(("swipe", 400, 400 - rng.randint(50, 300)))  # too short: snaps back
+        elif i % 5 == 2:
+            steps.append(("flick", 450, 300))  # short but fast: swipes on velocity
+        else:
+            steps.append(("swipe", 650, 70) if rng.random() < 0.7 else ("swipe", 70, 650))
+    steps.append(("quit",))
+    return steps
+
+
+def replay(steps):
+    """Post the scripted gestures as pygame events in real time."""
+    import pygame
+
+    post = pygame.event.post
+    time.sleep(1.0)  # let the first frame come up
+    for step in steps:
+        if step[0] == "quit":
+            post(pygame.event.Event(pygame.QUIT))
+            return
+        if step[0] == "tap":
+            _, x, y = step
+            post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(x, y), button=1, input_time=time.perf_counter()))
+            time.sleep(0.05)
+            post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(x, y), button=1, input_time=time.perf_counter()))
+        else:
+            kind, x0, x1 = step
+            post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(x0, 360), button=1, input_time=time.perf_counter()))
+            moves = 15 if kind == "swipe" else 4
+            for k in range(1, moves + 1):
+                time.sleep(1 / MOTION_HZ)
+                x = x0 + (x1 - x0) * k // moves
+                post(pygame.event.Event(pygame.MOUSEMOTION, pos=(x, 360), rel=((x1 - x0) // moves, 0), buttons=(1, 0, 0), input_time=time.perf_counter()))
+            post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(x1, 360), button=1, input_time=time.perf_counter()))
+        time.sleep(STEP_PAUSE)
+
+
+def run(logos, swipes, overlay=False):
+    import store
+    import telemetry
+
+    cwd = os.getcwd()
+    db_file, telemetry_file = store.DB_FILE, telemetry.TELEMETRY_FILE
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Generating {logos} cocktails and logos...", file=sys.stderr)
+        make_workdir(workdir, logos)
+        os.chdir(workdir)
+        try:
+            import frame_profiler
+            import interface
+
+            profiler = frame_profiler.FrameProfiler(overlay=overlay)
+            print(f"Replaying {swipes} gestures...", file=sys.stderr)
+            threading.Thread(target=replay, args=(script(swipes),), daemon=True).start()
+            interface.run_interface(profiler)
+        finally:
+            telemetry.flush()
+            store.DB_FILE, telemetry.TELEMETRY_FILE = db_file, telemetry_file
+            os.chdir(cwd)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "logos": logos,
+        "gestures": swipes,
+    }
+    report.update(profiler.report())
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the touchscreen UI headless with scripted input.")
+    parser.add_argument("--logos", type=int, default=DEFAULT_LOGOS, help="cocktails/logos on the generated menu")
+    parser.add_argument("--swipes", type=int, default=DEFAULT_SWIPES, help="scripted gestures to replay")
+    parser.add_argument("--overlay", action="store_true", help="also draw the on-screen timing overlay")
+    parser.add_argument("--output", default="ui_results.json", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    report = run(args.logos, args.swipes, args.overlay)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    total = report["total"]
+    print(f"{report['frames']} frames, first after {report['first_frame_s'] or 0:.3f} s; "
+          f"p50 {total['p50'] * 1000:.2f} ms, p95 {total['p95'] * 1000:.2f} ms, p99 {total['p99'] * 1000:.2f} ms")
+    latency = report["input_latency"]
+    print(f"input-to-photon p50 {latency['p50'] * 1000:.2f} ms, p95 {latency['p95'] * 1000:.2f} ms")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
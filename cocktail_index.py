@@ -0,0 +1,91 @@
+# cocktail_index.py
+"""
+In-memory index of the cocktail menu for the kiosk.
+
+CocktailIndex maps each cocktail's safe name (the logo filename without
+".png", e.g. "classic_whisky_sour") to its compiled recipes.Recipe, so looking up the drink
+behind a logo is a dict lookup instead of a query on every tap. The menu is
+only re-read from the store when its "cocktails" revision changes.
+
+watch() polls drink_logos/ and the store's revision from a background
+thread and calls back when either changes, so recipes and logos generated
+in the WebUI show up on the screen without restarting it. A stat() and one
+indexed SELECT a second is cheap and works everywhere, without an inotify
+binding (the database file's own mtime is no use in WAL mode).
+"""
+import os
+import threading
+import time
+
+import store
+
+RELOAD_INTERVAL = 1.0  # seconds between checks for changes
+
+safe_name = store.safe_name
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class CocktailIndex:
+    """Recipes from the store keyed by safe name, reloaded when the menu changes."""
+
+    def __init__(self):
+        self.key = None  # (database, revision) last loaded
+        self.cocktails = {}
+        self.lock = threading.Lock()
+
+    def reload(self):
+        """Re-read the menu if it changed in the store. Returns True if the index changed."""
+        key = (store.DB_FILE, store.revision("cocktails"))
+        if key == self.key:
+            return False
+        cocktails = {}
+        for recipe in store.get_recipes():
+            cocktails[safe_name(recipe.name)] = recipe
+        with self.lock:
+            self.cocktails = cocktails
+            self.key = key
+        return True
+
+    def get(self, name):
+        """Recipe for a logo filename or cocktail name, or None."""
+        self.reload()
+        with self.lock:
+            return self.cocktails.get(safe_name(name))
+
+    def __len__(self):
+        return len(self.cocktails)
+
+
+def watch(paths, callback, interval=RELOAD_INTERVAL, revision=None):
+    """
+    Call `callback()` from a background thread whenever one of `paths` (files
+    or directories) changes its mtime, or `revision()` returns something new.
+    Returns the daemon thread.
+    """
+    def state():
+        current = {path: _mtime(path) for path in paths}
+        if revision is not None:
+            current[None] = revision()
+        return current
+
+    def poll():
+        seen = state()
+        while True:
+            time.sleep(interval)
+            try:
+                current = state()
+                if current != seen:
+                    seen = current
+                    callback()
+            except Exception as e:
+                print(f"Error handling change in {', '.join(paths)}: {e}")
+
+    thread = threading.Thread(target=poll, daemon=True)
+    thread.start()
+    return thread
@@ -2,17 +2,23 @@
 
 DEBUG = False  # Toggle debug mode on/off
              # If True, no GPIO access, only prints what's happening.
+             # (Same as TIPSY_BACKEND=debug; see hardware.py for all backends.)
 
-if not DEBUG:
-    import RPi.GPIO as GPIO
-import time
 import os
-import json
-from dotenv import load_dotenv
+import threading
+import uuid
+
+import hardware
+import inventory
+import pour_plans
+import telemetry
+import timing
 
 
 # Define GPIO pins for each motor here (same as your test).
 # Adjust these if needed to match your hardware.
+# Pumps 9 and 10 share GPIO23 here, so the scheduler never runs two pumps
+# with a common pin at the same time (see run_pour_schedule).
 MOTORS = [
     (17, 4),   # Pump 1
     (22, 27),  # Pump 2
@@ -28,160 +34,748 @@ MOTORS = [
     (16, 12),  # Pump 12
 ]
 
+# How many pumps may run at the same time during a pour. The power supply
+# can't drive all 12 at once, so extra ingredients wait for a free slot.
+# Can be overridden with MAX_CONCURRENT_PUMPS in .env.
+MAX_CONCURRENT_PUMPS = 4
+
+# Approximate draw of a single running pump and the total current the supply
+# can deliver. Prime and clean cycles run as many pumps at once as fit in the
+# budget. CURRENT_BUDGET_AMPS can be overridden in .env.
+PUMP_CURRENT_AMPS = 0.8
+CURRENT_BUDGET_AMPS = 3.2
+
+# Seconds allowed for swapping glasses between drinks in a round.
+GLASS_SWAP_SECONDS = 4
+
+# PWM flow control for synchronized pours. Each pump's speed is scaled so
+# every ingredient finishes at the same moment, and pumps ramp up/down in
+# RAMP_STEPS steps over RAMP_SECONDS to avoid inrush spikes. Pumps stall
+# below MIN_DUTY percent. Set PWM_SYNC=1 in .env to make it the default.
+MIN_DUTY = 30
+RAMP_SECONDS = 0.3
+RAMP_STEPS = 5
+
+
+# Set by hold_gpio() when a long-lived process (pour_service.py) owns the
+# pins. While held, jobs skip their own setup_gpio()/cleanup.
+_gpio_held = False
+
+# True between setup_gpio() and the backend cleanup; emergency_stop() only
+# touches the pins while they are set up.
+_gpio_ready = False
+
+# timing.TimingLog of the most recent run_pour_schedule() call.
+last_timing = None
+
+# Physical emergency stop button (wired to ground, internal pull-up).
+STOP_PIN = 24
+
+# Set by emergency_stop(); the running schedule checks it while waiting.
+_stop_requested = threading.Event()
+
+# emergency_stop() calls so far, and the count when pour_service accepted
+# the next job (see accept_job); a stop in between is kept for that job.
+_stop_lock = threading.Lock()
+_stops = 0
+_accepted_at = None
+
+
+# The hardware backend every pin change and wait goes through.
+backend = hardware.get_backend("debug" if DEBUG else None)
+
+
+def set_backend(new_backend):
+    """Swap the GPIO backend, e.g. controller.set_backend(hardware.SimulatedBackend())."""
+    global backend
+    backend = new_backend
+
 
 def setup_gpio():
-    """Set up all motor pins for OUTPUT."""
-    if DEBUG:
-        print("DEBUG: setup_gpio() called — Not actually initializing GPIO pins.")
-    else:
-        GPIO.setmode(GPIO.BCM)
-        for ia, ib in MOTORS:
-            GPIO.setup(ia, GPIO.OUT)
-            GPIO.setup(ib, GPIO.OUT)
+    """Set up all motor pins for OUTPUT and arm the emergency stop button."""
+    global _gpio_ready
+    backend.setup([pin for pair in MOTORS for pin in pair])
+    backend.watch_input(STOP_PIN, lambda pin: emergency_stop())
+    _gpio_ready = True
+
+def _cleanup_gpio():
+    global _gpio_ready
+    _gpio_ready = False
+    backend.cleanup()
+
+def emergency_stop():
+    """
+    Stop every pump right now and cancel the running pour, prime or clean.
+    Safe to call from any thread (UI handlers, the stop button callback),
+    and a no-op on the pins while no job has them set up.
+    """
+    global _stops
+    with _stop_lock:
+        _stops += 1
+        _stop_requested.set()
+    if _gpio_ready:
+        try:
+            for ia, ib in MOTORS:
+                motor_stop(ia, ib)
+        except RuntimeError as e:
+            # The pins were released by a job finishing at the same moment.
+            print(f"Error stopping pumps: {e}")
+    print("EMERGENCY STOP: all pumps stopped.")
 
 def motor_forward(ia, ib):
     """Drive motor forward."""
-    if DEBUG:
-        print(f"DEBUG: motor_forward(ia={ia}, ib={ib}) called — No actual motor movement.")
-    else:
-        GPIO.output(ia, GPIO.HIGH)
-        GPIO.output(ib, GPIO.LOW)
+    backend.output(ia, True)
+    backend.output(ib, False)
 
 def motor_stop(ia, ib):
     """Stop motor."""
-    if DEBUG:
-        print(f"DEBUG: motor_stop(ia={ia}, ib={ib}) called — No actual motor movement.")
-    else:
-        GPIO.output(ia, GPIO.LOW)
-        GPIO.output(ib, GPIO.LOW)
-def motor_reverse(ia,ib):
-    if DEBUG:
-        print("Debug reverse")
+    backend.output(ia, False)
+    backend.output(ib, False)
+
+def motor_reverse(ia, ib):
+    """Drive motor in reverse."""
+    backend.output(ia, False)
+    backend.output(ib, True)
+
+def motor_speed(ia, ib, duty):
+    """Drive motor forward at `duty` percent (0 stops it) using PWM on the IA pin."""
+    backend.output(ib, False)
+    backend.pwm(ia, duty)
+
+def hold_gpio():
+    """Set up GPIO once and keep it across jobs until release_gpio()."""
+    global _gpio_held
+    setup_gpio()
+    _gpio_held = True
+
+def release_gpio():
+    """Stop every pump and give the GPIO pins back."""
+    global _gpio_held
+    _gpio_held = False
+    for ia, ib in MOTORS:
+        motor_stop(ia, ib)
+    _cleanup_gpio()
+
+def accept_job():
+    """
+    Note that a job was just taken off a queue (pour_service calls this as
+    it dequeues). Stops from then on are kept for that job, even if they
+    arrive before it starts.
+    """
+    global _accepted_at
+    with _stop_lock:
+        _accepted_at = _stops
+
+def _accept_job():
+    """
+    Forget stops from earlier jobs. Called first thing by every job, before
+    any lookup, so a stop pressed while the job is being prepared still
+    cancels it before a pump starts. A stop that came after accept_job()
+    is kept.
+    """
+    global _accepted_at
+    with _stop_lock:
+        if _accepted_at is None or _accepted_at == _stops:
+            _stop_requested.clear()
+        _accepted_at = None
+
+def _begin_job():
+    if not _gpio_held:
+        setup_gpio()
+
+def _end_job():
+    if not _gpio_held:
+        _cleanup_gpio()
+
+def _pins(job):
+    return {job["ia"], job["ib"]}
+
+def _pin_conflicts(jobs):
+    """True if two of `jobs` drive a common GPIO pin (e.g. Pumps 9 and 10 share GPIO23)."""
+    seen = set()
+    for job in jobs:
+        if _pins(job) & seen:
+            return True
+        seen |= _pins(job)
+    return False
+
+def _check_unique_pumps(jobs):
+    """Raise ValueError if a pump appears in more than one job."""
+    seen = set()
+    for job in jobs:
+        if job["pump"] in seen:
+            raise ValueError(f"{job['pump']} is scheduled twice; merge its jobs into one.")
+        seen.add(job["pump"])
+
+def _emit(on_event, event, **data):
+    """Send a progress event to `on_event` if one was given."""
+    if on_event:
+        data["event"] = event
+        on_event(data)
+
+def _drive(job, direction):
+    """Start a job's pump in the given direction."""
+    if direction == "reverse":
+        motor_reverse(job["ia"], job["ib"])
     else:
-        GPIO.output(ia,GPIO.LOW)
-        GPIO.output(ib,GPIO.HIGH)
+        motor_forward(job["ia"], job["ib"])
+
+def _pump_cycle_jobs(duration, durations, direction, verb, pulse=None):
+    """Build one job per pump for prime/clean cycles, honouring per-pump overrides."""
+    durations = durations or {}
+    jobs = []
+    for index, (ia, ib) in enumerate(MOTORS, start=1):
+        pump_label = f"Pump {index}"
+        seconds = float(durations.get(pump_label, duration))
+        jobs.append({
+            "pump": pump_label,
+            "ingredient": pump_label,
+            "ia": ia,
+            "ib": ib,
+            "seconds": seconds,
+            "direction": direction,
+            "pulse": pulse,
+            "message": f"{verb} {pump_label} for {seconds} seconds...",
+        })
+    return jobs
 
-def prime_pumps(duration):
+def prime_pumps(duration, durations=None, current_budget=None, on_event=None):
     """
-    Primes each pump for `duration` seconds in sequence (one after another).
+    Primes every pump for `duration` seconds, running as many pumps at once
+    as the current budget allows (see CURRENT_BUDGET_AMPS).
+
+    `durations` can override the time for single pumps, e.g. {"Pump 3": 20}.
+    Returns the total cycle time in seconds.
     """
-    setup_gpio()
+    _accept_job()
+    pour_plans.load_env()
+    slots = get_current_budget_slots(current_budget)
+    jobs = _pump_cycle_jobs(duration, durations, "forward", "Priming")
+    _begin_job()
     try:
-        for index, (ia, ib) in enumerate(MOTORS, start=1):
-            print(f"Priming pump {index} for {duration} seconds...")
-            motor_forward(ia, ib)
-            time.sleep(duration)
-            motor_stop(ia, ib)
+        elapsed = run_pour_schedule(jobs, max_concurrent=slots, on_event=on_event, context={"kind": "prime"})["elapsed"]
+        print(f"Primed {len(jobs)} pumps in {elapsed:.2f} seconds ({slots} at a time).")
+        return elapsed
     finally:
-        if not DEBUG:
-            GPIO.cleanup()
-        else:
-            print("DEBUG: prime_pumps() complete — no GPIO cleanup in debug mode.")
+        _end_job()
 
 
-def clean_pumps(duration=10):
+def clean_pumps(duration=10, durations=None, current_budget=None, pulse=None, on_event=None):
     """
-    Reverse each pump for `duration` seconds (one after another),
-    e.g. for cleaning lines.
+    Reverse every pump for `duration` seconds, e.g. for cleaning lines,
+    running as many pumps at once as the current budget allows.
+
+    `durations` can override the time for single pumps. If `pulse` is set,
+    each pump alternates between reverse and forward every `pulse` seconds
+    to scrub the lines instead of only running backwards.
+    Returns the total cycle time in seconds.
     """
-    setup_gpio()
+    _accept_job()
+    pour_plans.load_env()
+    slots = get_current_budget_slots(current_budget)
+    verb = "Pulse cleaning" if pulse else "Reversing (cleaning)"
+    jobs = _pump_cycle_jobs(duration, durations, "reverse", verb, pulse=pulse)
+    _begin_job()
     try:
-        for index, (ia, ib) in enumerate(MOTORS, start=1):
-            print(f"Reversing pump {index} for {duration} seconds (cleaning)...")
-            motor_reverse(ia, ib)
-            time.sleep(duration)
-            motor_stop(ia, ib)
+        elapsed = run_pour_schedule(jobs, max_concurrent=slots, on_event=on_event, context={"kind": "clean"})["elapsed"]
+        print(f"Cleaned {len(jobs)} pumps in {elapsed:.2f} seconds ({slots} at a time).")
+        return elapsed
     finally:
-        if not DEBUG:
-            GPIO.cleanup()
-        else:
-            print("DEBUG: clean_pumps() complete no GPIO cleanup in debug mode.")
+        _end_job()
+
+def get_current_budget(current_budget=None):
+    """
+    The current budget in amps: explicit argument, then CURRENT_BUDGET_AMPS
+    in .env, then the module default.
+    """
+    if current_budget is None:
+        env_value = os.getenv("CURRENT_BUDGET_AMPS")
+        try:
+            current_budget = float(env_value) if env_value else CURRENT_BUDGET_AMPS
+        except ValueError:
+            print(f"Invalid CURRENT_BUDGET_AMPS '{env_value}', using {CURRENT_BUDGET_AMPS}.")
+            current_budget = CURRENT_BUDGET_AMPS
+    return float(current_budget)
+
+def get_current_budget_slots(current_budget=None):
+    """How many pumps running at full speed fit in the current budget."""
+    slots = int(get_current_budget(current_budget) // PUMP_CURRENT_AMPS)
+    return max(1, min(slots, len(MOTORS)))
+
+def use_pwm_sync(synchronized=None):
+    """Whether drinks use synchronized PWM pours: explicit argument, then PWM_SYNC in .env."""
+    if synchronized is None:
+        return os.getenv("PWM_SYNC", "").strip().lower() in ("1", "true", "yes", "on")
+    return bool(synchronized)
+
+def get_max_concurrent(max_concurrent=None):
+    """Resolve the pump cap: explicit argument, then .env, then MAX_CONCURRENT_PUMPS."""
+    if max_concurrent is None:
+        env_value = os.getenv("MAX_CONCURRENT_PUMPS")
+        try:
+            max_concurrent = int(env_value) if env_value else MAX_CONCURRENT_PUMPS
+        except ValueError:
+            print(f"Invalid MAX_CONCURRENT_PUMPS '{env_value}', using {MAX_CONCURRENT_PUMPS}.")
+            max_concurrent = MAX_CONCURRENT_PUMPS
+    return max(1, min(int(max_concurrent), len(MOTORS)))
 
-def make_drink(pump_config_path, recipe, single_or_double="single"):
+def _record_pour(record, job, context, poured):
+    """Log a finished (or cut short) activation and add its volume to `poured`."""
+    if job["seconds"] > 0 and job.get("oz"):
+        oz = job["oz"] * min(record["actual"] / job["seconds"], 1.0)
+        poured[job["ingredient"]] = round(poured.get(job["ingredient"], 0) + oz, 3)
+    context = context or {}
+    telemetry.record(
+        context.get("kind", "pour"),
+        record["pump"],
+        job["ingredient"],
+        record["target"],
+        record["actual"],
+        drink_id=context.get("drink_id"),
+        source=context.get("source"),
+    )
+
+def run_pour_schedule(jobs, max_concurrent=MAX_CONCURRENT_PUMPS, layered=False, on_event=None, context=None):
+    """
+    Run pour jobs concurrently and return
+        {"elapsed": seconds, "cancelled": bool, "poured": {ingredient: oz}}.
+
+    Each job is a dict with at least "pump", "ingredient", "ia", "ib" and
+    "seconds". Up to `max_concurrent` pumps are started together and each one
+    is stopped at its own deadline, freeing a slot for the next waiting job,
+    so a drink takes about as long as its longest pour. Waiting jobs are
+    started longest-first to keep the total time down.
+
+    With `layered=True` jobs run one at a time in the given (recipe) order,
+    for drinks where ingredients must go into the glass in sequence.
+
+    A job never starts while a running job uses one of its pins: switching
+    a shared pin for one pump would stop or reverse the other.
+
+    Optional job keys: "direction" ("forward" or "reverse"), "pulse" (flip
+    direction every N seconds) and "message" (printed when the pump starts).
+
+    `on_event`, if given, is called with a dict for the initial "schedule"
+    and for every "pump_start" and "pump_stop" so callers can show progress.
+
+    Stop times are absolute monotonic deadlines (see timing.py) and the real
+    on-time of every pump is kept in `last_timing` for jitter measurements.
+    Every activation is also logged to telemetry.py, tagged with `context`
+    ({"kind", "drink_id", "source"}).
+
+    emergency_stop() (or the physical stop button) cancels the schedule:
+    every pump stops at once and "poured" holds the partial volumes.
+
+    Raises ValueError if two jobs name the same pump (merge them first, as
+    pour_plans.compile_recipe does).
+    """
+    global last_timing
+    _check_unique_pumps(jobs)
+    poured = {}
+    cancelled = False
+    if layered:
+        pending = list(jobs)
+        limit = 1
+    else:
+        pending = sorted(jobs, key=lambda job: job["seconds"], reverse=True)
+        limit = max(1, max_concurrent)
+
+    running = []  # list of {"job", "deadline", "direction", "next_flip"}
+    log = timing.TimingLog(clock=backend.monotonic)
+    start = backend.monotonic()
+    _emit(on_event, "schedule", pumps=[
+        {"pump": job["pump"], "ingredient": job["ingredient"], "seconds": job["seconds"]} for job in pending
+    ])
+    try:
+        while (pending or running) and not _stop_requested.is_set():
+            # Switch on every pump that has a free slot first, then do the
+            # slow printing/event work, so it can't delay a pump's start.
+            started = []
+            while pending and len(running) < limit:
+                busy = set().union(*(_pins(r["job"]) for r in running))
+                job = next((job for job in pending if not _pins(job) & busy), None)
+                if job is None:
+                    break
+                pending.remove(job)
+                if job["seconds"] <= 0:
+                    continue
+                direction = job.get("direction", "forward")
+                _drive(job, direction)
+                on_time = log.pump_on(job["pump"], job["seconds"])
+                pulse = job.get("pulse")
+                running.append({
+                    "job": job,
+                    "deadline": on_time + job["seconds"],
+                    "direction": direction,
+                    "next_flip": on_time + pulse if pulse else None,
+                })
+                started.append((job, on_time))
+            for job, on_time in started:
+                print(job.get("message") or f"Pouring {round(job.get('oz', 0), 2):g} oz of {job['ingredient']} via {job['pump']} for {job['seconds']:.2f} seconds.")
+                _emit(on_event, "pump_start", pump=job["pump"], ingredient=job["ingredient"], seconds=job["seconds"], elapsed=on_time - start)
+
+            if not running:
+                continue
+
+            # Wait for the earliest absolute deadline or pulse flip, then handle everything due.
+            next_event = min(min(r["deadline"], r["next_flip"] or r["deadline"]) for r in running)
+            if not backend.wait_until(next_event, cancel=_stop_requested):
+                break
+            now = backend.monotonic()
+            still_running = []
+            stopped = []
+            for r in running:
+                job = r["job"]
+                if r["deadline"] <= now:
+                    motor_stop(job["ia"], job["ib"])
+                    stopped.append((log.pump_off(job["pump"]), job))
+                    continue
+                if r["next_flip"] is not None and r["next_flip"] <= now:
+                    r["direction"] = "forward" if r["direction"] == "reverse" else "reverse"
+                    motor_stop(job["ia"], job["ib"])
+                    _drive(job, r["direction"])
+                    r["next_flip"] += job["pulse"]
+                still_running.append(r)
+            running = still_running
+            for record, job in stopped:
+                _record_pour(record, job, context, poured)
+                _emit(on_event, "pump_stop", pump=record["pump"], target=record["target"], actual=record["actual"], elapsed=backend.monotonic() - start)
+    finally:
+        # Never leave a pump running if something goes wrong mid-pour.
+        for r in running:
+            motor_stop(r["job"]["ia"], r["job"]["ib"])
+        for r in running:
+            _record_pour(log.pump_off(r["job"]["pump"]), r["job"], context, poured)
+        last_timing = log
+    if _stop_requested.is_set():
+        cancelled = True
+        summary = ", ".join(f"{oz:.2f} oz {name}" for name, oz in poured.items()) or "nothing"
+        print(f"Pour cancelled! Already poured: {summary}.")
+        _emit(on_event, "cancelled", poured=poured)
+    return {"elapsed": backend.monotonic() - start, "cancelled": cancelled, "poured": poured}
+
+def _ramp_profile(seconds, duty):
+    """
+    PWM steps for one pump that deliver the same volume as `seconds` at full
+    speed when running at `duty` percent with soft start/stop ramps.
+    Returns ([(offset, duty), ...], total_seconds); the last step is 0 (off).
+    """
+    step = RAMP_SECONDS / RAMP_STEPS
+    # Each ramp delivers duty * RAMP_SECONDS * (N + 1) / (2N); the hold covers the rest.
+    ramp_volume = duty * RAMP_SECONDS * (RAMP_STEPS + 1) / RAMP_STEPS
+    hold = (100 * seconds - ramp_volume) / duty
+    if hold < 0:
+        # Too short to ramp: plain on/off at full speed.
+        return [(0.0, 100), (seconds, 0)], seconds
+    actions = [(k * step, duty * (k + 1) / RAMP_STEPS) for k in range(RAMP_STEPS)]
+    down_start = RAMP_SECONDS + hold
+    actions += [(down_start + k * step, duty * (RAMP_STEPS - k) / RAMP_STEPS) for k in range(RAMP_STEPS)]
+    total = down_start + RAMP_SECONDS
+    actions.append((total, 0))
+    return actions, total
+
+def _delivered_fraction(actions, seconds, elapsed):
+    """Fraction of a pump's volume already delivered `elapsed` seconds into its profile."""
+    delivered = 0.0
+    for (offset, duty), (next_offset, _) in zip(actions, actions[1:]):
+        if elapsed <= offset:
+            break
+        delivered += duty * (min(elapsed, next_offset) - offset)
+    return min(delivered / (100 * seconds), 1.0) if seconds > 0 else 0.0
+
+def plan_synchronized(jobs, current_budget=None):
+    """
+    Pick a PWM duty and start delay for every job so they all finish together.
+
+    The shared pour time is the longest pour at full speed, stretched if
+    needed so the summed pump current (peak duty x PUMP_CURRENT_AMPS) stays
+    within the current budget. A pump that would run below MIN_DUTY runs at
+    MIN_DUTY instead and starts later, so it still finishes with the rest;
+    its current still counts against the budget, and the pour time is
+    stretched again for the others if it doesn't fit.
+    Returns [(job, duty, actions, total, delay), ...], or None if the pumps
+    can't share the budget even at MIN_DUTY.
+    """
+    jobs = [job for job in jobs if job["seconds"] > 0]
+    if not jobs:
+        return []
+    budget = get_current_budget(current_budget)
+    pour_time = max(max(job["seconds"] for job in jobs), PUMP_CURRENT_AMPS * sum(job["seconds"] for job in jobs) / budget)
+    # Every round either fits or moves at least one more pump to a fixed duty.
+    for _ in range(len(jobs) + 2):
+        profiles = []
+        fixed = variable = 0.0
+        for job in jobs:
+            duty = min(100.0, max(MIN_DUTY, 100 * job["seconds"] / pour_time))
+            actions, total = _ramp_profile(job["seconds"], duty)
+            peak = PUMP_CURRENT_AMPS * max(level for _, level in actions) / 100
+            # Clamped pumps and ones too short to ramp draw the same however long the pour is.
+            if duty == MIN_DUTY or len(actions) == 2:
+                fixed += peak
+            else:
+                variable += peak
+            profiles.append((job, duty, actions, total))
+        if fixed + variable <= budget * (1 + 1e-9):
+            finish = max(total for _, _, _, total in profiles)
+            return [(job, duty, actions, total, finish - total) for job, duty, actions, total in profiles]
+        if fixed >= budget:
+            return None
+        pour_time *= variable / (budget - fixed)
+    return None
+
+def run_synchronized_pour(jobs, current_budget=None, on_event=None, context=None):
+    """
+    Pour all jobs at once with PWM speed control so every line finishes at
+    the same moment (see plan_synchronized). Returns the same result dict as
+    run_pour_schedule and honours emergency_stop() the same way.
+
+    Pumps that share a GPIO pin can't run at the same time, so a drink that
+    needs two of them is handed to run_pour_schedule instead, as is one
+    whose pumps don't fit the current budget even at MIN_DUTY.
+    """
+    global last_timing
+    _check_unique_pumps(jobs)
+    slots = min(get_max_concurrent(), get_current_budget_slots(current_budget))  # for the fallbacks
+    if _pin_conflicts([job for job in jobs if job["seconds"] > 0]):
+        print("Pumps with a shared pin in this drink, pouring without PWM sync.")
+        return run_pour_schedule(jobs, max_concurrent=slots, on_event=on_event, context=context)
+    planned = plan_synchronized(jobs, current_budget)
+    if planned is None:
+        print(f"Too many pumps for the current budget at {MIN_DUTY}% duty, pouring without PWM sync.")
+        return run_pour_schedule(jobs, max_concurrent=slots, on_event=on_event, context=context)
+    log = timing.TimingLog(clock=backend.monotonic)
+    poured = {}
+    start = backend.monotonic()
+    _emit(on_event, "schedule", pumps=[
+        {"pump": job["pump"], "ingredient": job["ingredient"], "seconds": total, "duty": duty}
+        for job, duty, _, total, _ in planned
+    ])
+    timeline = sorted(
+        (delay + offset, i, level) for i, (_, _, actions, _, delay) in enumerate(planned) for offset, level in actions
+    )
+    running = set()
+    try:
+        for offset, i, level in timeline:
+            if not backend.wait_until(start + offset, cancel=_stop_requested):
+                break
+            job, duty, actions, total, _ = planned[i]
+            motor_speed(job["ia"], job["ib"], level)
+            if i not in running and level > 0:
+                running.add(i)
+                log.pump_on(job["pump"], total)
+                print(f"Pouring {round(job.get('oz', 0), 2):g} oz of {job['ingredient']} via {job['pump']} at {duty:.0f}% for {total:.2f} seconds.")
+                _emit(on_event, "pump_start", pump=job["pump"], ingredient=job["ingredient"], seconds=total, duty=duty, elapsed=offset)
+            elif level == 0 and i in running:
+                running.discard(i)
+                record = log.pump_off(job["pump"])
+                _record_pour(record, job, context, poured)
+                _emit(on_event, "pump_stop", pump=job["pump"], target=record["target"], actual=record["actual"], elapsed=offset)
+    finally:
+        for i in running:
+            job, duty, actions, total, _ = planned[i]
+            motor_speed(job["ia"], job["ib"], 0)
+        for i in running:
+            job, duty, actions, total, _ = planned[i]
+            record = log.pump_off(job["pump"])
+            fraction = _delivered_fraction(actions, job["seconds"], record["actual"])
+            # Log the cut-short activation, then count the volume the ramps really delivered.
+            _record_pour(record, dict(job, oz=0), context, poured)
+            if job.get("oz"):
+                poured[job["ingredient"]] = round(poured.get(job["ingredient"], 0) + job["oz"] * fraction, 3)
+        last_timing = log
+    cancelled = _stop_requested.is_set()
+    if cancelled:
+        summary = ", ".join(f"{oz:.2f} oz {name}" for name, oz in poured.items()) or "nothing"
+        print(f"Pour cancelled! Already poured: {summary}.")
+        _emit(on_event, "cancelled", poured=poured)
+    return {"elapsed": backend.monotonic() - start, "cancelled": cancelled, "poured": poured}
+
+def _drink_jobs(plan, single_or_double):
+    """Scheduler jobs for one glass of a compiled pour plan."""
+    size = "double" if single_or_double.lower() == "double" else "single"
+    factor = 2 if size == "double" else 1
+    jobs = []
+    for step in plan["steps"]:
+        jobs.append({
+            "pump": step["pump"],
+            "ingredient": step["ingredient"],
+            "oz": step["oz"] * factor,
+            "ia": step["ia"],
+            "ib": step["ib"],
+            "seconds": step[size],
+        })
+    return jobs
+
+def _check_inventory(needed, jobs):
+    """inventory.check() with ingredient names; adds them to the shortages it returns."""
+    names = {job["pump"]: job["ingredient"] for job in jobs}
+    short = inventory.check(needed, names)
+    for label, entry in short.items():
+        entry["ingredient"] = names.get(label, label)
+    return short
+
+def make_drink(pump_config_path, recipe, single_or_double="single", max_concurrent=None, layered=False, on_event=None, source=None, synchronized=None):
     """
     Prepare a drink using the hardware pumps, based on:
-      1) pump_config.json (mapping from Pump # -> ingredient name)
-      2) a `recipe` dict from cocktails.json (with "ingredients": {...})
+      1) the pump assignments in the store (Pump # -> ingredient name;
+         `pump_config_path` is only kept for older callers)
+      2) a `recipe` from the cocktail menu: a dict with "ingredients": {...}
+         or a compiled recipes.Recipe
       3) single_or_double parameter (either "single" or "double").
 
+    All needed pumps run at the same time (up to `max_concurrent`, default
+    from MAX_CONCURRENT_PUMPS), so the drink takes as long as its longest
+    pour. Pass `layered=True` to pour ingredients one by one in recipe order.
+    `source` names the front end ("kiosk", "webui") for telemetry.
+    With `synchronized=True` (default from PWM_SYNC in .env) every pump runs
+    at once with PWM speed control so all ingredients finish together.
+
+    Returns {"elapsed", "cancelled", "poured": {ingredient: oz}}; if the pour
+    was stopped with emergency_stop(), "poured" holds the partial volumes.
+    If a tracked pump hasn't got enough left (see inventory.py), nothing is
+    poured and "short" holds {pump: {"ingredient", "needed_oz", "remaining_oz"}}.
+    What each pump poured is taken out of the inventory ledger afterwards
+    (on real pumps only, not on the sim or debug backends).
+
     In debug mode, only prints messages instead of driving motors.
     """
+    _accept_job()
     if DEBUG:
         print(pump_config_path, recipe, single_or_double)
-    # 1) Load the pump config dictionary, e.g. {"Pump 1": "vodka", "Pump 2": "gin", ...}
-    if not os.path.exists(pump_config_path):
-        print(f"pump_config file not found: {pump_config_path}")
-        return
-
-    try:
-        with open(pump_config_path, "r") as f:
-            pump_config = json.load(f)
-    except Exception as e:
-        print(f"Error reading {pump_config_path}: {e}")
+    # 1) Look up the compiled pour plan (cached until the pump assignments,
+    #    the menu or OZ_CALIBRATION change).
+    plan = pour_plans.plan_for(recipe, pump_config_path)
+    if plan is None:
         return
 
-    # 2) Extract the recipe's ingredients
-    ingredients = recipe.get("ingredients", {})
-    if not ingredients:
+    # 2) Make sure the recipe has something to pour
+    if not plan["ingredients"]:
         print("No ingredients found in recipe.")
         return
+    for ingredient_name, reason in plan["skipped"]:
+        print(f"Skipping '{ingredient_name}': {reason}.")
 
-    # 3) Single or double factor
-    factor = 2 if single_or_double.lower() == "double" else 1
+    # 3) Single or double
+    jobs = _drink_jobs(plan, single_or_double)
+    max_concurrent = get_max_concurrent(max_concurrent)
 
-    # 4) Get the 1oz coefficient (seconds per ounce) from environment or default to 8
-    load_dotenv()
-    oz_coefficient = int(os.getenv("OZ_CALIBRATION"))
+    # 4) Refuse the order before any pump starts if a bottle is short
+    short = _check_inventory(inventory.needed_by_pump(jobs), jobs)
+    if short:
+        _emit(on_event, "short", short=short)
+        return {"elapsed": 0.0, "cancelled": False, "poured": {}, "short": short}
 
-    setup_gpio()
+    _begin_job()
     try:
-        for ingredient_name, measurement_str in ingredients.items():
-            parts = measurement_str.split()
-            if not parts:
-                print(f"Cannot parse measurement for {ingredient_name}. Skipping.")
-                continue
-            try:
-                oz_amount = float(parts[0])  # parse numeric
-            except ValueError:
-                print(f"Cannot parse numeric amount '{parts[0]}' for {ingredient_name}. Skipping.")
-                continue
-
-            oz_needed = oz_amount * factor
+        context = {"kind": "pour", "drink_id": uuid.uuid4().hex[:12], "source": source}
+        if use_pwm_sync(synchronized) and not layered:
+            result = run_synchronized_pour(jobs, on_event=on_event, context=context)
+        else:
+            result = run_pour_schedule(jobs, max_concurrent=max_concurrent, layered=layered, on_event=on_event, context=context)
+        if backend.drives_pumps:
+            inventory.record(inventory.poured_by_pump(jobs, result))
+        if not result["cancelled"]:
+            print(f"Finished making the drink in {result['elapsed']:.2f} seconds! "
+                  f"(worst pump timing error {last_timing.summary()['max_error'] * 1000:.1f} ms)")
+        return result
+    finally:
+        _end_job()
 
-            # find a matching pump label in pump_config
-            chosen_pump = None
-            for pump_label, config_ing_name in pump_config.items():
-                if config_ing_name.strip().lower() == ingredient_name.strip().lower():
-                    chosen_pump = pump_label
-                    break
+def make_round(pump_config_path, orders, max_concurrent=None, swap_seconds=GLASS_SWAP_SECONDS, wait_for_glass=None, on_event=None, source=None):
+    """
+    Pour a whole round of drinks in one go.
 
-            if not chosen_pump:
-                print(f"No pump mapped to ingredient '{ingredient_name}'. Skipping.")
-                continue
+    `orders` is a list of (recipe, "single"/"double", count) entries. Every
+    glass is planned before the first pump starts and GPIO stays set up for
+    the whole round. Glasses of the same drink are poured back to back so
+    their pumps stay primed, and the next glass's pumps start the moment it
+    is in place.
 
-            # parse 'Pump 1' -> index=0
-            try:
-                pump_num_str = chosen_pump.replace("Pump", "").strip()
-                pump_index = int(pump_num_str) - 1
-            except ValueError:
-                print(f"Could not parse pump label '{chosen_pump}'. Skipping.")
-                continue
+    Between glasses the round waits `swap_seconds` for the glass to be
+    swapped, or calls `wait_for_glass(glass_number)` if given (e.g. to wait
+    for a button press). Returns {"glasses", "elapsed", "separate_estimate",
+    "cancelled"} where separate_estimate is what the same glasses take poured
+    one ingredient after another, as make_drink used to, with the same swaps.
+    An emergency stop ends the round; "cancelled" then holds the glass
+    number and its partial volumes, and "glasses" counts the finished ones.
+    The whole round is checked against the inventory first, like make_drink
+    ("short" is set and nothing poured if a tracked pump can't cover it).
+    """
+    _accept_job()
+    max_concurrent = get_max_concurrent(max_concurrent)
 
-            if pump_index < 0 or pump_index >= len(MOTORS):
-                print(f"Pump index {pump_index} out of range for '{ingredient_name}'. Skipping.")
-                continue
+    # Plan every glass up front, grouping identical drinks together.
+    grouped = {}
+    for recipe, single_or_double, count in orders:
+        if count <= 0:
+            continue
+        plan = pour_plans.plan_for(recipe, pump_config_path)
+        if plan is None:
+            return None
+        if not plan["steps"]:
+            print(f"Nothing to pour for '{plan['name'] or 'drink'}'. Skipping.")
+            continue
+        for ingredient_name, reason in plan["skipped"]:
+            print(f"Skipping '{ingredient_name}' in {plan['name']}: {reason}.")
+        key = (plan["name"].lower(), single_or_double.lower())
+        if key not in grouped:
+            grouped[key] = {"name": plan["name"], "jobs": _drink_jobs(plan, single_or_double), "count": 0}
+        grouped[key]["count"] += count
 
-            ia, ib = MOTORS[pump_index]
-            seconds_to_pour = oz_needed * oz_coefficient
+    glasses = []
+    for group in grouped.values():
+        glasses.extend([(group["name"], group["jobs"])] * group["count"])
+    if not glasses:
+        print("No drinks to pour in this round.")
+        return None
 
-            print(f"Pouring {oz_needed} oz of {ingredient_name} via {chosen_pump} for {seconds_to_pour:.2f} seconds.")
-            motor_forward(ia, ib)
-            time.sleep(seconds_to_pour)
-            motor_stop(ia, ib)
+    needed = {}
+    for group in grouped.values():
+        for label, oz in inventory.needed_by_pump(group["jobs"], group["count"]).items():
+            needed[label] = needed.get(label, 0.0) + oz
+    short = _check_inventory(needed, [job for group in grouped.values() for job in group["jobs"]])
+    if short:
+        _emit(on_event, "short", short=short)
+        return {"glasses": 0, "elapsed": 0.0, "separate_estimate": 0.0, "cancelled": None, "short": short}
 
-        print("Finished making the drink!")
+    _emit(on_event, "round", glasses=[name for name, _ in glasses])
+    pour_time = 0.0
+    cancelled = None
+    _begin_job()
+    start = backend.monotonic()
+    try:
+        for number, (name, jobs) in enumerate(glasses, start=1):
+            if number > 1:
+                _emit(on_event, "swap", glass=number)
+                if wait_for_glass:
+                    wait_for_glass(number)
+                elif not backend.wait_until(backend.monotonic() + swap_seconds, cancel=_stop_requested):
+                    cancelled = {"glass": number, "poured": {}}
+                    break
+                if _stop_requested.is_set():
+                    cancelled = {"glass": number, "poured": {}}
+                    break
+            print(f"Round glass {number}/{len(glasses)}: {name}")
+            _emit(on_event, "glass_start", glass=number, name=name)
+            context = {"kind": "pour", "drink_id": uuid.uuid4().hex[:12], "source": source}
+            result = run_pour_schedule(jobs, max_concurrent=max_concurrent, on_event=on_event, context=context)
+            if backend.drives_pumps:
+                inventory.record(inventory.poured_by_pump(jobs, result))
+            pour_time += result["elapsed"]
+            if result["cancelled"]:
+                cancelled = {"glass": number, "poured": result["poured"]}
+                break
+            _emit(on_event, "glass_done", glass=number, name=name)
+        elapsed = backend.monotonic() - start
     finally:
-        if not DEBUG:
-            GPIO.cleanup()
-        else:
-            print("DEBUG: make_drink() complete — no GPIO cleanup in debug mode.")
+        _end_job()
+
+    # One-at-a-time estimate: each drink poured ingredient by ingredient
+    # (the old behaviour) plus the same glass swap in between.
+    separate = sum(sum(job["seconds"] for job in jobs) for _, jobs in glasses) + swap_seconds * (len(glasses) - 1)
+    if cancelled:
+        print(f"Round cancelled during glass {cancelled['glass']}/{len(glasses)}.")
+        return {"glasses": cancelled["glass"] - 1, "elapsed": elapsed, "separate_estimate": separate, "cancelled": cancelled}
+    print(f"Poured a round of {len(glasses)} drinks in {elapsed:.2f} seconds "
+          f"({pour_time:.2f} s pouring, about {separate:.0f} s one drink at a time).")
+    return {"glasses": len(glasses), "elapsed": elapsed, "separate_estimate": separate, "cancelled": None}
@@ -0,0 +1,148 @@
+# frame_profiler.py
+"""
+Per-frame render timing for the kiosk UI (interface.py).
+
+Every frame the interface draws is split into phases:
+
+    events    handling the frame's input events
+    tweens    advancing animations
+    blit      background and drink logos
+    scale     resizing animated mode logos
+    text      drink name
+    present   pushing the dirty regions to the display
+    pour      one frame of the pouring screen
+
+and the report gives count, mean, p50/p95/p99, max and a histogram per
+phase and for the whole frame, plus the time to the first frame and the
+input-to-photon latency (gestures.GestureTracker.take_latency).
+
+Turn it on with TIPSY_PROFILE=frames.json (written when the interface
+exits) and TIPSY_PROFILE_OVERLAY=1 for a live readout in the top-left
+corner. bench_ui.py runs it headless with scripted swipes and taps.
+"""
+import os
+import json
+import time
+from collections import deque
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is open).
+HISTOGRAM_MS = [1, 2, 4, 8, 16, 33, 66]
+OVERLAY_FRAMES = 120  # frames averaged for the on-screen readout
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def summarize(values):
+    """Stats (in seconds) and a millisecond histogram for a list of durations."""
+    histogram = {}
+    lower = 0
+    for upper in HISTOGRAM_MS:
+        histogram[f"{lower}-{upper}ms"] = sum(1 for v in values if lower <= v * 1000 < upper)
+        lower = upper
+    histogram[f">={lower}ms"] = sum(1 for v in values if v * 1000 >= lower)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+        "histogram": histogram,
+    }
+
+
+class FrameProfiler:
+    """
+    Collects phase timings per frame with lap(): each call charges the time
+    since the previous one to a phase. Disabled profilers cost one check.
+    """
+
+    def __init__(self, enabled=True, overlay=False, output=None):
+        self.enabled = enabled
+        self.overlay = enabled and overlay
+        self.output = output
+        self.created = time.perf_counter()
+        self.first_frame = None
+        self.frames = []
+        self.current = {}
+        self.frame_start = None
+        self.last = None
+        self.recent = deque(maxlen=OVERLAY_FRAMES)
+        self.latencies = []
+        self.recent_latencies = deque(maxlen=OVERLAY_FRAMES)
+
+    @classmethod
+    def from_env(cls):
+        """Profiler configured by TIPSY_PROFILE / TIPSY_PROFILE_OVERLAY (disabled if unset)."""
+        output = os.getenv("TIPSY_PROFILE")
+        overlay = os.getenv("TIPSY_PROFILE_OVERLAY", "").strip().lower() in ("1", "true", "yes", "on")
+        return cls(enabled=bool(output or overlay), overlay=overlay, output=output)
+
+    def start_frame(self):
+        """Start timing a frame (after any blocking wait for input)."""
+        if self.enabled:
+            self.current = {}
+            self.frame_start = self.last = time.perf_counter()
+
+    def lap(self, name):
+        """Add the time since the previous lap (or the frame start) to phase `name`."""
+        if self.enabled and self.frame_start is not None:
+            now = time.perf_counter()
+            self.current[name] = self.current.get(name, 0.0) + now - self.last
+            self.last = now
+
+    def end_frame(self, input_latency=None):
+        """
+        Close a frame that drew something; call start_frame() again for the
+        next one. `input_latency` is the input-to-photon time of the oldest
+        input this frame shows, if any.
+        """
+        if not self.enabled or self.frame_start is None:
+            return
+        if input_latency is not None:
+            self.latencies.append(input_latency)
+            self.recent_latencies.append(input_latency)
+        now = time.perf_counter()
+        if self.first_frame is None:
+            self.first_frame = now - self.created
+        frame = dict(self.current, total=now - self.frame_start)
+        self.frames.append(frame)
+        self.recent.append(frame["total"])
+        self.frame_start = None
+
+    def report(self):
+        phases = {}
+        for frame in self.frames:
+            for name, value in frame.items():
+                if name != "total":
+                    phases.setdefault(name, []).append(value)
+        return {
+            "frames": len(self.frames),
+            "first_frame_s": self.first_frame,
+            "total": summarize([frame["total"] for frame in self.frames]),
+            "input_latency": summarize(self.latencies),
+            "phases": {name: summarize(values) for name, values in sorted(phases.items())},
+        }
+
+    def write(self, path=None):
+        """Write the report as JSON to `path` (default: the TIPSY_PROFILE file)."""
+        path = path or self.output
+        if not path or not self.enabled:
+            return None
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Frame profile written to {path}")
+        return report
+
+    def overlay_text(self):
+        """One-line readout of the recent frames, e.g. "p50 3.1 ms  p95 7.9 ms  lat 9.0 ms"."""
+        recent = list(self.recent)
+        latency = percentile(list(self.recent_latencies), 95)
+        return f"p50 {percentile(recent, 50) * 1000:.1f} ms  p95 {percentile(recent, 95) * 1000:.1f} ms  lat {latency * 1000:.1f} ms"
@@ -0,0 +1,139 @@
+# gestures.py
+"""
+Touch/mouse gesture recognition for the kiosk carousel.
+
+GestureTracker turns raw pygame events into a few gestures:
+
+    ("press", pos)     finger/mouse went down
+    ("tap", pos)       released without moving more than TAP_SLOP
+    ("swipe", step)    released after a long drag or a quick flick;
+                       step is 1 (next drink, finger moved left) or -1
+    ("snap", None)     released after a drag that wasn't enough to swipe
+
+Motion events only update the tracker's position, so any number of them
+arriving in one frame cost a single redraw at the latest position (read
+.offset once per frame). A swipe commits on distance (SWIPE_DISTANCE of
+the screen width) or on a flick: release velocity over FLICK_VELOCITY
+px/s, measured over the last VELOCITY_WINDOW seconds, in the direction of
+the drag. FINGERDOWN/FINGERMOTION/FINGERUP are handled natively (first
+finger only); mouse events SDL synthesises from touches are ignored.
+
+The tracker also remembers when the oldest input not yet on screen
+arrived; take_latency() after a frame is presented gives input-to-photon
+latency. Events with an `input_time` attribute (perf_counter seconds, e.g.
+from a replay script) use it; others are timed when dequeued.
+"""
+import time
+from collections import deque
+import pygame
+
+TAP_SLOP = 10            # px of movement still counted as a tap
+SWIPE_DISTANCE = 0.5     # fraction of screen width that always swipes
+FLICK_VELOCITY = 600     # px/s release speed that swipes
+FLICK_DISTANCE = 30      # px a flick must travel
+VELOCITY_WINDOW = 0.1    # seconds of motion used for the release velocity
+
+
+class GestureTracker:
+    """Tracks one pointer (mouse or first finger) and classifies releases."""
+
+    def __init__(self, screen_size):
+        self.width, self.height = screen_size
+        self.pressed = False
+        self.finger = None
+        self.start = (0, 0)
+        self.x = 0
+        self.samples = deque()  # (time, x)
+        self.release_velocity = 0.0
+        self.pending_input = None
+
+    @property
+    def offset(self):
+        """Horizontal drag distance so far (negative = towards the next drink)."""
+        return self.x - self.start[0] if self.pressed else 0
+
+    def velocity(self, now=None):
+        """Horizontal speed in px/s over the last VELOCITY_WINDOW seconds."""
+        now = time.perf_counter() if now is None else now
+        while len(self.samples) > 2 and self.samples[0][0] < now - VELOCITY_WINDOW:
+            self.samples.popleft()
+        if len(self.samples) < 2:
+            return 0.0
+        (t0, x0), (t1, x1) = self.samples[0], self.samples[-1]
+        if t1 - t0 <= 0 or t1 < now - VELOCITY_WINDOW:
+            return 0.0
+        return (x1 - x0) / (t1 - t0)
+
+    def _pointer(self, event):
+        """(kind, pos) for pointer events, or None. Kind is "down", "move" or "up"."""
+        if event.type in (pygame.FINGERDOWN, pygame.FINGERMOTION, pygame.FINGERUP):
+            if event.type == pygame.FINGERDOWN and self.finger is None and not self.pressed:
+                self.finger = event.finger_id
+            if event.finger_id != self.finger:
+                return None  # ignore extra fingers
+            pos = (event.x * self.width, event.y * self.height)
+            if event.type == pygame.FINGERUP:
+                self.finger = None
+                return "up", pos
+            return ("down" if event.type == pygame.FINGERDOWN else "move"), pos
+        if getattr(event, "touch", False):
+            return None  # mouse event emulated from a touch we already handle
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            return "down", event.pos
+        if event.type == pygame.MOUSEMOTION:
+            return "move", event.pos
+        if event.type == pygame.MOUSEBUTTONUP:
+            return "up", event.pos
+        return None
+
+    def handle(self, event):
+        """Feed one event; returns a gesture tuple (see module docstring) or None."""
+        pointer = self._pointer(event)
+        if pointer is None:
+            return None
+        kind, pos = pointer
+        now = getattr(event, "input_time", None) or time.perf_counter()
+        if kind == "down":
+            self.pressed = True
+            self.start = pos
+            self.x = pos[0]
+            self.samples.clear()
+            self.samples.append((now, self.x))
+            self._input(now)
+            return "press", pos
+        if not self.pressed:
+            return None
+        self.x = pos[0]
+        self.samples.append((now, self.x))
+        self._input(now)
+        if kind == "move":
+            return None
+        offset = self.offset
+        velocity = self.velocity(now)
+        self.pressed = False
+        if abs(offset) < TAP_SLOP:
+            return "tap", pos
+        flick = abs(velocity) > FLICK_VELOCITY and abs(offset) > FLICK_DISTANCE and (velocity < 0) == (offset < 0)
+        if abs(offset) > self.width * SWIPE_DISTANCE or flick:
+            self.release_velocity = velocity
+            return "swipe", 1 if offset < 0 else -1
+        return "snap", None
+
+    def slide_ms(self, distance, longest):
+        """How long the slide after a swipe should take: keep the flick's speed, capped at `longest` ms."""
+        speed = abs(self.release_velocity)
+        if speed <= 0:
+            return longest
+        return max(longest / 3, min(longest, abs(distance) / speed * 1000))
+
+    def _input(self, now):
+        if self.pending_input is None or now < self.pending_input:
+            self.pending_input = now
+
+    def take_latency(self):
+        """Seconds since the oldest input not yet shown (call right after presenting a frame), or None."""
+        if self.pending_input is None:
+            return None
+        latency = time.perf_counter() - self.pending_input
+        self.pending_input = None
+        return latency
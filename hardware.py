@@ -0,0 +1,288 @@
+# hardware.py
+"""
+Pluggable GPIO backends for controller.py.
+
+    RPiBackend        - real pins through RPi.GPIO (the default on the Pi)
+    DebugBackend      - prints pin changes, sleeps in real time (old DEBUG mode)
+    SimulatedBackend  - records every pin transition on a virtual clock that
+                        runs as fast as you like, so thousands of pours,
+                        primes and cleans can be replayed in seconds
+
+The controller only talks to a backend through setup/output/cleanup and the
+backend's clock (monotonic/sleep/wait_until), so simulated runs go through
+exactly the same scheduling code as real ones.
+
+Pick one with TIPSY_BACKEND=rpi|debug|sim, or call controller.set_backend().
+"""
+import os
+import threading
+import time
+
+import timing
+
+
+class GPIOBackend:
+    """Base backend: real wall clock, no pins. Subclasses drive the hardware."""
+
+    name = "base"
+    # True only where pins move real pumps; pours on other backends don't
+    # touch the inventory ledger.
+    drives_pumps = False
+
+    def setup(self, pins):
+        """Configure `pins` as outputs."""
+
+    def output(self, pin, high):
+        """Drive `pin` HIGH (True) or LOW (False)."""
+
+    def cleanup(self):
+        """Release every pin."""
+
+    def watch_input(self, pin, callback):
+        """Call `callback(pin)` when the (pulled-up) input `pin` is pulled low."""
+
+    def pwm(self, pin, duty):
+        """Drive `pin` with a PWM duty cycle in percent (0 = LOW, 100 = HIGH)."""
+        self.output(pin, duty >= 50)
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait_until(self, deadline, cancel=None):
+        """Block until monotonic() reaches `deadline`; False if `cancel` was set."""
+        return timing.wait_until(deadline, clock=self.monotonic, sleep=self.sleep, cancel=cancel)
+
+
+class RPiBackend(GPIOBackend):
+    name = "rpi"
+    drives_pumps = True
+
+    # Software PWM frequency for pump speed control.
+    PWM_FREQUENCY = 200
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self.pwms = {}
+
+    def setup(self, pins):
+        self.GPIO.setmode(self.GPIO.BCM)
+        for pin in pins:
+            self.GPIO.setup(pin, self.GPIO.OUT)
+
+    def output(self, pin, high):
+        if pin in self.pwms:
+            # The pin is under PWM control, so drive it through the duty cycle.
+            self.pwms[pin].ChangeDutyCycle(100 if high else 0)
+            return
+        self.GPIO.output(pin, self.GPIO.HIGH if high else self.GPIO.LOW)
+
+    def pwm(self, pin, duty):
+        duty = max(0.0, min(100.0, duty))
+        if pin not in self.pwms:
+            self.pwms[pin] = self.GPIO.PWM(pin, self.PWM_FREQUENCY)
+            self.pwms[pin].start(duty)
+        else:
+            self.pwms[pin].ChangeDutyCycle(duty)
+
+    def cleanup(self):
+        for pwm in self.pwms.values():
+            pwm.stop()
+        self.pwms = {}
+        self.GPIO.cleanup()
+
+    def watch_input(self, pin, callback):
+        self.GPIO.setup(pin, self.GPIO.IN, pull_up_down=self.GPIO.PUD_UP)
+        try:
+            self.GPIO.add_event_detect(pin, self.GPIO.FALLING, callback=callback, bouncetime=50)
+        except RuntimeError:
+            pass  # already watching this pin
+
+
+class DebugBackend(GPIOBackend):
+    name = "debug"
+
+    def setup(self, pins):
+        print("DEBUG: setup_gpio() called — Not actually initializing GPIO pins.")
+
+    def output(self, pin, high):
+        print(f"DEBUG: GPIO {pin} -> {'HIGH' if high else 'LOW'} — No actual motor movement.")
+
+    def pwm(self, pin, duty):
+        print(f"DEBUG: GPIO {pin} -> PWM {duty:.0f}% — No actual motor movement.")
+
+    def cleanup(self):
+        print("DEBUG: no GPIO cleanup in debug mode.")
+
+
+class SimulatedBackend(GPIOBackend):
+    """
+    In-memory pins on a virtual clock.
+
+    `speed` is how many virtual seconds pass per real second; 0 (the
+    default) means waits return immediately. Every output() call is
+    recorded in `transitions` as (virtual time, pin, high); PWM changes
+    are also kept in `duty_changes` as (virtual time, pin, duty). Pins
+    switched from another thread during a wait (e.g. an emergency stop)
+    are stamped with the virtual time reached so far, not the wait's start.
+    """
+
+    name = "sim"
+
+    def __init__(self, speed=0):
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear the clock, pin states and recorded transitions."""
+        with self.lock:
+            self.now = 0.0
+            self.waiting = None  # (real start, virtual start, deadline) of a wait in progress
+            self.pins = {}
+            self.transitions = []
+            self.duty_changes = []
+            self.setup_calls = 0
+            self.cleanup_calls = 0
+            self.inputs = {}
+
+    def setup(self, pins):
+        with self.lock:
+            self.setup_calls += 1
+            for pin in pins:
+                self.pins.setdefault(pin, False)
+
+    def _current(self):
+        """Virtual time right now (lock held): mid-wait, the wait's start plus the real time elapsed."""
+        if self.waiting is None:
+            return self.now
+        real_start, virtual_start, deadline = self.waiting
+        return min(virtual_start + (time.monotonic() - real_start) * self.speed, deadline)
+
+    def output(self, pin, high):
+        with self.lock:
+            high = bool(high)
+            self.pins[pin] = high
+            self.transitions.append((self._current(), pin, high))
+
+    def pwm(self, pin, duty):
+        with self.lock:
+            now = self._current()
+            high = duty > 0
+            if self.pins.get(pin) != high:
+                self.transitions.append((now, pin, high))
+            self.pins[pin] = high
+            self.duty_changes.append((now, pin, duty))
+
+    def cleanup(self):
+        with self.lock:
+            self.cleanup_calls += 1
+            for pin in self.pins:
+                self.pins[pin] = False
+
+    def watch_input(self, pin, callback):
+        with self.lock:
+            self.inputs[pin] = callback
+
+    def press(self, pin):
+        """Simulate pulling input `pin` low (e.g. the emergency stop button)."""
+        callback = self.inputs.get(pin)
+        if callback:
+            callback(pin)
+
+    def monotonic(self):
+        with self.lock:
+            return self._current()
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if self.speed:
+            time.sleep(seconds / self.speed)
+        with self.lock:
+            self.now += seconds
+
+    def wait_until(self, deadline, cancel=None):
+        # No spinning on a virtual clock: jump straight to the deadline.
+        remaining = deadline - self.monotonic()
+        if remaining > 0 and self.speed:
+            with self.lock:
+                self.waiting = (time.monotonic(), self.now, deadline)
+            try:
+                if cancel is not None:
+                    if cancel.wait(remaining / self.speed):
+                        return False
+                else:
+                    time.sleep(remaining / self.speed)
+            finally:
+                with self.lock:
+                    self.now = self._current()
+                    self.waiting = None
+        if cancel is not None and cancel.is_set():
+            return False
+        with self.lock:
+            self.now = max(self.now, deadline)
+        return True
+
+    def delivered(self, pin):
+        """Duty-weighted on-time of `pin` in full-speed seconds (PWM and plain output)."""
+        total = 0.0
+        level = 0.0
+        since = 0.0
+        changes = [(t, p, 100.0 if high else 0.0) for t, p, high in self.transitions if p == pin]
+        changes += [(t, p, duty) for t, p, duty in self.duty_changes if p == pin]
+        # Plain outputs and PWM changes at the same instant: PWM wins (sorted after).
+        changes.sort(key=lambda change: change[0])
+        for t, _, duty in changes:
+            total += level * (t - since) / 100
+            level, since = duty, t
+        return total + level * (self.now - since) / 100
+
+    def pin_history(self, pin):
+        """[(time, high), ...] for one pin."""
+        return [(t, high) for t, p, high in self.transitions if p == pin]
+
+    def on_intervals(self, ia, ib):
+        """
+        [(start, end, direction), ...] for the motor on pins (ia, ib), where
+        direction is "forward" (ia high) or "reverse" (ib high).
+        """
+        intervals = []
+        state = {ia: False, ib: False}
+        current = None  # (start, direction)
+        for t, pin, high in self.transitions:
+            if pin not in state:
+                continue
+            state[pin] = high
+            if state[ia] and not state[ib]:
+                direction = "forward"
+            elif state[ib] and not state[ia]:
+                direction = "reverse"
+            else:
+                direction = None
+            if current and current[1] != direction:
+                intervals.append((current[0], t, current[1]))
+                current = None
+            if direction and not current:
+                current = (t, direction)
+        if current:
+            intervals.append((current[0], self.now, current[1]))
+        return intervals
+
+
+BACKENDS = {
+    "rpi": RPiBackend,
+    "debug": DebugBackend,
+    "sim": SimulatedBackend,
+}
+
+
+def get_backend(name=None):
+    """Create the backend named `name` (or TIPSY_BACKEND, default "rpi")."""
+    name = (name or os.getenv("TIPSY_BACKEND") or "rpi").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown GPIO backend '{name}', expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,199 @@
+# ingredients.py
+"""
+Canonical ingredient names, so a recipe's "Lime" or "Tuquila" still finds
+the pump holding Lime Juice or Tequila.
+
+IngredientIndex resolves a name in three steps:
+
+    1. exact match on a canonical name (case, spacing and punctuation ignored)
+    2. the alias table: built-in ALIASES plus aliases saved in the store
+    3. fuzzy match, for typos: candidates are ranked by trigram similarity
+       (Dice coefficient) against canonical names and aliases, and a
+       candidate is only accepted if it has the same number of words and
+       every word is within a typo or two of its counterpart (word_edits),
+       at FUZZY_MATCH or better and only if one candidate wins outright.
+       Names that merely share a word ("Coconut Milk" and "Coconut Rum",
+       "Maple Syrup" and "Simple Syrup") or different words ("Lemonade",
+       "Orange") are left to the alias table rather than guessed.
+
+The canonical vocabulary is KNOWN_INGREDIENTS plus any pump ingredient that
+doesn't resolve to one of them. Results are memoised per spelling, so after
+the first lookup resolving a name is a dict lookup; pour plans are compiled
+against it (store.ingredient_index()) and unresolved ingredients are
+reported when a recipe is saved, not mid-pour.
+"""
+import re
+import unicodedata
+from collections import Counter
+
+FUZZY_MATCH = 0.5          # minimum trigram similarity for a fuzzy match
+FUZZY_LENGTH_DIFFERENCE = 2  # a typo changes the length by at most this many letters
+
+KNOWN_INGREDIENTS = [
+    "Vodka", "Gin", "White Rum", "Dark Rum", "Spiced Rum", "Coconut Rum",
+    "Tequila", "Mezcal", "Whisky", "Bourbon", "Rye Whiskey", "Scotch", "Brandy", "Cognac",
+    "Triple Sec", "Blue Curacao", "Coffee Liqueur", "Amaretto", "Peach Schnapps",
+    "Dry Vermouth", "Sweet Vermouth", "Campari", "Aperol", "Prosecco",
+    "Lime Juice", "Lemon Juice", "Orange Juice", "Cranberry Juice", "Pineapple Juice", "Grapefruit Juice",
+    "Simple Syrup", "Grenadine", "Honey Syrup", "Agave Syrup",
+    "Soda Water", "Tonic Water", "Cola", "Ginger Beer", "Ginger Ale", "Lemon-Lime Soda",
+    "Bitters", "Coconut Cream", "Cream",
+]
+
+ALIASES = {
+    "lime": "Lime Juice",
+    "fresh lime juice": "Lime Juice",
+    "lemon": "Lemon Juice",
+    "fresh lemon juice": "Lemon Juice",
+    "simple": "Simple Syrup",
+    "sugar syrup": "Simple Syrup",
+    "gomme": "Simple Syrup",
+    "light rum": "White Rum",
+    "silver rum": "White Rum",
+    "blanco tequila": "Tequila",
+    "silver tequila": "Tequila",
+    "whiskey": "Whisky",
+    "cointreau": "Triple Sec",
+    "orange liqueur": "Triple Sec",
+    "kahlua": "Coffee Liqueur",
+    "grenadine syrup": "Grenadine",
+    "club soda": "Soda Water",
+    "soda": "Soda Water",
+    "sparkling water": "Soda Water",
+    "tonic": "Tonic Water",
+    "coke": "Cola",
+    "sprite": "Lemon-Lime Soda",
+    "7up": "Lemon-Lime Soda",
+    "angostura bitters": "Bitters",
+    "heavy cream": "Cream",
+}
+
+
+def normalize(name):
+    """Lower-case, accent- and punctuation-free, single-spaced form of a name: " Lemon-Lime  Soda" -> "lemon lime soda"."""
+    text = unicodedata.normalize("NFKD", str(name).lower()).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def word_edits(word):
+    """Typos allowed in one word: none below 4 letters, one up to 7, two from 8."""
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Edits (insert, delete, substitute, swap two neighbours) between `a` and
+    `b`, or limit + 1 once it is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i]
+        for j in range(1, len(b) + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def words_match(key, other):
+    """True if two normalized names have the same words, each within word_edits() typos."""
+    words, other_words = key.split(), other.split()
+    if len(words) != len(other_words):
+        return False
+    for word, other_word in zip(words, other_words):
+        limit = word_edits(max(word, other_word, key=len))
+        if edit_distance(word, other_word, limit) > limit:
+            return False
+    return True
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientIndex:
+    """Resolves ingredient names (any spelling) to canonical names."""
+
+    def __init__(self, names=(), aliases=None):
+        self.canonical = {}   # normalized name -> canonical name
+        self.aliases = {}     # normalized alias -> canonical name
+        self.postings = {}    # trigram -> set of normalized names/aliases
+        self.sizes = {}       # normalized name/alias -> number of trigrams
+        self.memo = {}
+        for name in KNOWN_INGREDIENTS:
+            self._add_canonical(name)
+        for alias, target in ALIASES.items():
+            self.add_alias(alias, target)
+        for alias, target in (aliases or {}).items():
+            self.add_alias(alias, target)
+        for name in names:
+            self.add(name)
+
+    def _index(self, key):
+        grams = trigrams(key)
+        self.sizes[key] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(key)
+        self.memo.clear()
+
+    def _add_canonical(self, name):
+        key = normalize(name)
+        if key and key not in self.canonical:
+            self.canonical[key] = name.strip()
+            self._index(key)
+
+    def add(self, name):
+        """Add `name` to the vocabulary unless it already resolves to a known ingredient."""
+        if name and name.strip() and self.resolve(name) is None:
+            self._add_canonical(name)
+
+    def add_alias(self, alias, target):
+        """Resolve `alias` to `target`'s canonical name (`target` is added to the vocabulary if new)."""
+        target = self.resolve(target) or target.strip()
+        self._add_canonical(target)
+        key = normalize(alias)
+        if key and key not in self.canonical:
+            self.aliases[key] = self.canonical[normalize(target)]
+            self._index(key)
+
+    def _fuzzy(self, key):
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = sorted(
+            ((2 * count / (len(grams) + self.sizes[other]), other) for other, count in shared.items()
+             if abs(len(other) - len(key)) <= FUZZY_LENGTH_DIFFERENCE and words_match(key, other)),
+            reverse=True,
+        )
+        if not scored or scored[0][0] < FUZZY_MATCH:
+            return None
+        best = self.canonical.get(scored[0][1]) or self.aliases[scored[0][1]]
+        for score, other in scored[1:]:
+            if score < scored[0][0]:
+                break
+            if (self.canonical.get(other) or self.aliases[other]) != best:
+                return None  # a tie between different ingredients: too close to call
+        return best
+
+    def resolve(self, name):
+        """Canonical name for `name`, or None if nothing matches well enough."""
+        key = normalize(name)
+        if key in self.memo:
+            return self.memo[key]
+        result = self.canonical.get(key) or self.aliases.get(key) or (self._fuzzy(key) if key else None)
+        self.memo[key] = result
+        return result
+
+    def key(self, name):
+        """Lookup key for matching recipe ingredients to pumps: the normalized canonical name."""
+        return normalize(self.resolve(name) or name)
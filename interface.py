@@ -2,199 +2,168 @@
 import os
 import pygame
 import time
-import json
 import threading
+import functools
 
-COCKTAILS_FILE = "cocktails.json"
-
-try:
-    import controller
-except ModuleNotFoundError:
-    print('Controller modules not found. Pump control will be disabled for Interface')
+# Pours go through the resident pour service (pour_service.py), which owns
+# the GPIO pins. It falls back to the controller in-process if not running.
+import pour_service
+import logo_cache
+import cocktail_index
+import tween
+import frame_profiler
+import sprite_cache
+import gestures as gesture_input
+import store
+import menu_matrix
 CONFIG_FILE = "pump_config.json"
 
-def animate_text_zoom(screen, base_text, position, start_size, target_size, duration=300, background=None, current_img=None, image_offset=0):
-    """Animate overlay text zooming from a small size to target size."""
-    clock = pygame.time.Clock()
-    start_time = pygame.time.get_ticks()
-    while True:
-        elapsed = pygame.time.get_ticks() - start_time
-        progress = min(elapsed / duration, 1.0)
-        current_size = int(start_size + (target_size - start_size) * progress)
-        font = pygame.font.SysFont(None, current_size)
-        text_surface = font.render(base_text, True, (255, 255, 255))
-        text_rect = text_surface.get_rect(center=position)
-        if background:
-            screen.blit(background, (0, 0))
-        if current_img:
-            screen.blit(current_img, (image_offset, 0))
-        screen.blit(text_surface, text_rect)
-        pygame.display.flip()
-        if progress >= 1.0:
-            break
-        clock.tick(60)
+# Leave drinks the current pumps can't make out of the carousel.
+HIDE_UNAVAILABLE = os.getenv("HIDE_UNAVAILABLE", "1").strip().lower() in ("1", "true", "yes", "on")
+
+# Redraw rate while something moves (drags). When the screen is static the
+# loop blocks on pygame.event.wait() instead and uses no CPU.
+FRAME_RATE = 60
+# Pour screen: redraw rate and spinner speed (degrees per second).
+POUR_FRAME_RATE = 30
+SPINNER_SPEED = 180
+# Length of the swipe / snap-back slide (ms).
+SWIPE_MS = 300
+# How long a notice (e.g. a drink refused for a short bottle) stays up (ms).
+NOTICE_MS = 5000
+# Posted by the watcher when the cocktail menu, pumps or drink_logos/ change.
+MENU_CHANGED = pygame.USEREVENT + 1
+
+# Rendered text surfaces kept in memory (LRU): the drink names around the
+# current one plus the sizes used by text animations and notices.
+TEXT_CACHE_SIZE = 512
+FONT_CACHE_SIZE = 64
+# Drink names pre-rendered on each side of the current one, so swipes never
+# hit the font renderer without rendering the whole menu at start-up.
+PREWARM_NAMES = 8
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_font(size):
+    """The default font at `size`, created once."""
+    return pygame.font.SysFont(None, size)
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, size, color=(255, 255, 255)):
+    """Rendered (antialiased) text surface, cached by (text, size, colour)."""
+    return get_font(size).render(text, True, color)
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def display_name(filename):
+    """"classic_whisky_sour.png" -> "Classic Whisky Sour"."""
+    return os.path.splitext(filename)[0].replace('_', ' ').title()
+
+def clear_text_cache():
+    """Drop cached fonts and text; they are invalid once pygame quits."""
+    get_font.cache_clear()
+    render_text.cache_clear()
+
+def wait_for_events(timeout=None):
+    """Block until an event arrives (or `timeout` ms pass) and return every pending event."""
+    event = pygame.event.wait(timeout) if timeout else pygame.event.wait()
+    events = [event] if event.type != pygame.NOEVENT else []
+    return events + pygame.event.get()
 
-def animate_logo_zoom(screen, logo, rect, base_size, target_size, duration=300, background=None, current_img=None):
+# Animations are declared as tweens (tween.py) on named values that
+# run_interface draws from every frame, so none of these block: several can
+# run at once and input is still handled on the next frame.
+
+def animate_text_zoom(tweens, name, start_size, target_size, duration=300):
+    """Animate overlay text `name` zooming from a small size to target size."""
+    tweens.start(name, start_size, target_size, duration)
+
+def animate_logo_zoom(tweens, name, base_size, target_size, duration=300, on_done=None):
     """Animate one logo zooming from base_size to target_size and back."""
-    clock = pygame.time.Clock()
-    center = rect.center
-    # Expand
-    start_time = pygame.time.get_ticks()
-    while True:
-        elapsed = pygame.time.get_ticks() - start_time
-        progress = min(elapsed / duration, 1.0)
-        current_size = int(base_size + (target_size - base_size) * progress)
-        scaled_img = pygame.transform.scale(logo, (current_size, current_size))
-        new_rect = scaled_img.get_rect(center=center)
-        if background:
-            screen.blit(background, (0, 0))
-        if current_img:
-            screen.blit(current_img, (0, 0))
-        screen.blit(scaled_img, new_rect)
-        pygame.display.flip()
-        if progress >= 1.0:
-            break
-        clock.tick(60)
-    # Contract back
-    start_time = pygame.time.get_ticks()
-    while True:
-        elapsed = pygame.time.get_ticks() - start_time
-        progress = min(elapsed / duration, 1.0)
-        current_size = int(target_size - (target_size - base_size) * progress)
-        scaled_img = pygame.transform.scale(logo, (current_size, current_size))
-        new_rect = scaled_img.get_rect(center=center)
-        if background:
-            screen.blit(background, (0, 0))
-        if current_img:
-            screen.blit(current_img, (0, 0))
-        screen.blit(scaled_img, new_rect)
-        pygame.display.flip()
-        if progress >= 1.0:
-            break
-        clock.tick(60)
-
-def animate_logo_click(screen, logo, rect, base_size, target_size, duration=150, background=None, current_img=None, screen_size=(720, 720)):
+    tweens.sequence(name, base_size, [(target_size, duration), (base_size, duration)], on_done=on_done)
+
+def animate_logo_click(tweens, name, base_size, target_size, duration=150, on_done=None):
     """Animate a logo click (pop effect): grow from base_size to target_size then shrink back."""
-    clock = pygame.time.Clock()
-    center = rect.center
-    # Expand
-    start_time = pygame.time.get_ticks()
-    while True:
-        elapsed = pygame.time.get_ticks() - start_time
-        progress = min(elapsed / duration, 1.0)
-        current_size = int(base_size + (target_size - base_size) * progress)
-        scaled_img = pygame.transform.scale(logo, (current_size, current_size))
-        new_rect = scaled_img.get_rect(center=center)
-        if background:
-            screen.blit(background, (0, 0))
-        if current_img:
-            screen.blit(current_img, (current_img.get_rect(center=(screen_size[0] // 2, screen_size[1] // 2))))
-        screen.blit(scaled_img, new_rect)
-        pygame.display.flip()
-        if progress >= 1.0:
-            break
-        clock.tick(60)
-    # Shrink back
-    start_time = pygame.time.get_ticks()
-    while True:
-        elapsed = pygame.time.get_ticks() - start_time
-        progress = min(elapsed / duration, 1.0)
-        current_size = int(target_size - (target_size - base_size) * progress)
-        scaled_img = pygame.transform.scale(logo, (current_size, current_size))
-        new_rect = scaled_img.get_rect(center=center)
-        if background:
-            screen.blit(background, (0, 0))
-        if current_img:
-            screen.blit(current_img, (current_img.get_rect(center=(screen_size[0] // 2, screen_size[1] // 2))))
-        screen.blit(scaled_img, new_rect)
-        pygame.display.flip()
-        if progress >= 1.0:
-            break
-        clock.tick(60)
-
-def animate_both_logos_zoom(screen, single_logo, double_logo, single_rect, double_rect, base_size, target_size, duration=300, background=None, current_img=None):
+    animate_logo_zoom(tweens, name, base_size, target_size, duration, on_done)
+
+def animate_both_logos_zoom(tweens, base_size, target_size, duration=300):
     """Animate both logos zooming in together and then shrinking back."""
-    clock = pygame.time.Clock()
-    center_single = single_rect.center
-    center_double = double_rect.center
-    # Expand
-    start_time = pygame.time.get_ticks()
-    while True:
-        elapsed = pygame.time.get_ticks() - start_time
-        progress = min(elapsed / duration, 1.0)
-        current_size = int(base_size + (target_size - base_size) * progress)
-        scaled_single = pygame.transform.scale(single_logo, (current_size, current_size))
-        scaled_double = pygame.transform.scale(double_logo, (current_size, current_size))
-        new_rect_single = scaled_single.get_rect(center=center_single)
-        new_rect_double = scaled_double.get_rect(center=center_double)
-        if background:
-            screen.blit(background, (0, 0))
-        if current_img:
-            screen.blit(current_img, (0, 0))
-        screen.blit(scaled_single, new_rect_single)
-        screen.blit(scaled_double, new_rect_double)
-        pygame.display.flip()
-        if progress >= 1.0:
-            break
-        clock.tick(60)
-    # Contract
-    start_time = pygame.time.get_ticks()
-    while True:
-        elapsed = pygame.time.get_ticks() - start_time
-        progress = min(elapsed / duration, 1.0)
-        current_size = int(target_size - (target_size - base_size) * progress)
-        scaled_single = pygame.transform.scale(single_logo, (current_size, current_size))
-        scaled_double = pygame.transform.scale(double_logo, (current_size, current_size))
-        new_rect_single = scaled_single.get_rect(center=center_single)
-        new_rect_double = scaled_double.get_rect(center=center_double)
-        if background:
-            screen.blit(background, (0, 0))
-        if current_img:
-            screen.blit(current_img, (0, 0))
-        screen.blit(scaled_single, new_rect_single)
-        screen.blit(scaled_double, new_rect_double)
-        pygame.display.flip()
-        if progress >= 1.0:
-            break
-        clock.tick(60)
-
-def show_pouring_and_loading(screen, pouring_img, loading_img, duration_sec, background=None):
-    """Overlay pouring_img full screen and a spinning loading_img (720x720) drawn underneath."""
-    clock = pygame.time.Clock()
-    start_time = pygame.time.get_ticks()
-    angle = 0
-    screen_size = screen.get_size()
-    screen_width, screen_height = screen_size
-    while True:
-        elapsed = pygame.time.get_ticks() - start_time
-        if elapsed >= duration_sec * 1000:
-            break
-        angle = (angle + 5) % 360
-        rotated_loading = pygame.transform.rotate(loading_img, angle)
-        rotated_rect = rotated_loading.get_rect(center=(screen_width // 2, screen_height // 2))
-        if background:
-            screen.blit(background, (0, 0))
-        # Draw loading image first (under)
-        screen.blit(rotated_loading, rotated_rect)
-        # Then draw pouring image on top
-        screen.blit(pouring_img, (0, 0))
-        pygame.display.flip()
-        clock.tick(60)
+    animate_logo_zoom(tweens, "single", base_size, target_size, duration)
+    animate_logo_zoom(tweens, "double", base_size, target_size, duration)
 
-def parse_drink(filename):
-    base_name = os.path.splitext(filename)[0].replace("_", " ").lower()
+class PourProgress:
+    """
+    Live progress of a pour, fed from the pour thread by the controller's
+    progress events (schedule, pump_start, pump_stop) and read by the UI.
+    Progress is measured in pump seconds, so it is right for concurrent,
+    layered and PWM pours alike.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0.0
+        self.finished = 0.0
+        self.running = {}  # pump -> (ingredient, seconds, started)
 
-    with open(COCKTAILS_FILE, "r") as file:
-        data = json.load(file)
+    def on_event(self, event):
+        with self.lock:
+            if event["event"] == "schedule":
+                self.total = sum(pump["seconds"] for pump in event["pumps"])
+            elif event["event"] == "pump_start":
+                self.running[event["pump"]] = (event["ingredient"], event["seconds"], time.monotonic())
+            elif event["event"] == "pump_stop" and event["pump"] in self.running:
+                _, seconds, _ = self.running.pop(event["pump"])
+                self.finished += seconds
 
-    for cocktail in data.get("cocktails", []):
-        if cocktail["normal_name"].lower() == base_name:
-            return cocktail
+    def snapshot(self):
+        """(fraction done 0..1, names of the ingredients pouring right now)."""
+        now = time.monotonic()
+        with self.lock:
+            done = self.finished + sum(min(now - started, seconds) for _, seconds, started in self.running.values())
+            pouring = [ingredient for ingredient, _, _ in self.running.values()]
+            fraction = min(done / self.total, 1.0) if self.total else 0.0
+        return fraction, pouring
 
-    return None
+def draw_pour_frame(screen, pouring_img, loading_frame, fraction, status, background=None):
+    """One frame of the pour screen: loading_frame (the spinner, already rotated) under pouring_img, a progress bar and status text."""
+    screen_width, screen_height = screen.get_size()
+    if background:
+        screen.blit(background, (0, 0))
+    else:
+        screen.fill((0, 0, 0))
+    if loading_frame:
+        # Draw loading image first (under)
+        screen.blit(loading_frame, loading_frame.get_rect(center=(screen_width // 2, screen_height // 2)))
+    # Then draw pouring image on top
+    screen.blit(pouring_img, (0, 0))
+    bar = pygame.Rect(screen_width // 6, screen_height - 110, screen_width * 2 // 3, 16)
+    pygame.draw.rect(screen, (255, 255, 255), bar, 2)
+    pygame.draw.rect(screen, (255, 255, 255), (bar.x, bar.y, int(bar.width * fraction), bar.height))
+    if status:
+        status_text = render_text(status, 36)
+        screen.blit(status_text, status_text.get_rect(center=(screen_width // 2, screen_height - 140)))
+    stop_text = render_text("Tap anywhere to stop", 40)
+    screen.blit(stop_text, stop_text.get_rect(center=(screen_width // 2, screen_height - 60)))
+    pygame.display.flip()
 
+_cocktails = cocktail_index.CocktailIndex()
 
-def run_interface():
+def parse_drink(filename):
+    """Recipe for a logo filename, from the in-memory cocktail index."""
+    return _cocktails.get(filename)
+
+def can_make(filename):
+    """False for the logo of a cocktail the current pumps can't make (see menu_matrix)."""
+    matrix = menu_matrix.current()
+    if not matrix.feasible.any():
+        return True  # pumps not set up yet: show everything rather than nothing
+    return matrix.is_feasible(filename) is not False
+
+
+def run_interface(profiler=None):
+    """
+    Run the touchscreen UI. `profiler` (a frame_profiler.FrameProfiler)
+    records per-frame timings; by default it is set up from TIPSY_PROFILE.
+    """
+    profiler = profiler or frame_profiler.FrameProfiler.from_env()
     pygame.init()
     screen = pygame.display.set_mode((720, 720))
     screen_size = screen.get_size()
@@ -209,223 +178,328 @@ def run_interface():
         print("Error loading background image (tipsy.png):", e)
         background = None
 
-    # Load main swipe images (drink logos)
-    def get_images():
-        imgs = []
-        filenames = sorted([f for f in os.listdir("drink_logos") if f.lower().endswith('.png')])
-        for f in filenames:
-            path = os.path.join("drink_logos", f)
-            try:
-                img = pygame.image.load(path)
-                img = pygame.transform.scale(img, (screen_size[0] // 1.5, screen_size[1] // 1.5))
-                imgs.append((img, f))
-            except Exception as e:
-                print(f"Error loading {path}: {e}")
-        return imgs
-
-    images = get_images()
+    # Main swipe images (drink logos), decoded lazily around the current one
+    images = logo_cache.LogoCarousel("drink_logos", (screen_size[0] // 1.5, screen_size[1] // 1.5),
+                                     include=can_make if HIDE_UNAVAILABLE else None)
     if not images:
         print("No cocktail logos found in drink_logos")
         pygame.quit()
         return
 
     current_index = 0
+    images.focus(current_index)
     current_img, current_filename = images[current_index]
 
     def write_selection(filename):
-        safe_name = os.path.splitext(filename)[0]
-        with open("selected_cocktail.txt", "w") as f:
-            f.write(safe_name)
+        store.set_state("selected_cocktail", os.path.splitext(filename)[0])
 
     write_selection(current_filename)
 
     # Load extra logos and scale them to 75% of original (base size: 150x150)
+    # Animation frames (logo pop sizes, spinner angles) are built once in
+    # the sprite cache from the full-size images and then only blitted.
+    sprites = sprite_cache.SpriteCache()
     try:
-        single_logo = pygame.image.load("single.png")
+        single_logo = pygame.image.load("single.png").convert_alpha()
+        sprites.add_source("single", single_logo)
         single_logo = pygame.transform.scale(single_logo, (150, 150))
     except Exception as e:
         print("Error loading single.png:", e)
         single_logo = None
     try:
-        double_logo = pygame.image.load("double.png")
+        double_logo = pygame.image.load("double.png").convert_alpha()
+        sprites.add_source("double", double_logo)
         double_logo = pygame.transform.scale(double_logo, (150, 150))
     except Exception as e:
         print("Error loading double.png:", e)
         double_logo = None
 
+    # Pouring screen images, loaded once instead of on every tap.
+    try:
+        pouring_img = pygame.image.load("pouring.png").convert_alpha()
+        pouring_img = pygame.transform.scale(pouring_img, screen_size)
+    except Exception as e:
+        print("Error loading pouring.png:", e)
+        pouring_img = None
+    try:
+        loading_img = pygame.image.load("loading.png").convert_alpha()
+        loading_img = pygame.transform.scale(loading_img, (720,720))
+        sprites.add_source("spinner", sprite_cache.crop_centered(loading_img))
+    except Exception as e:
+        print("Error loading loading.png:", e)
+        loading_img = None
+
     # Position extra logos: single on left, double on right, spaced more toward edges.
     margin = 50  # adjust as needed for spacing
     single_rect = pygame.Rect(margin, (screen_height - 150) // 2, 150, 150)
     double_rect = pygame.Rect(screen_width - margin - 150, (screen_height - 150) // 2, 150, 150)
 
     dragging = False
-    drag_start_x = 0
     drag_offset = 0
+    gestures = gesture_input.GestureTracker(screen_size)
     clock = pygame.time.Clock()
+    tweens = tween.Tweens()
+    logo_size = 150
+    spacing = screen_width / 1.5  # distance between neighbouring drink logos
 
     normal_text_size = 60
     text_position = (screen_width // 2, int(screen_height * 0.81))
 
+    def prewarm_names(index):
+        """Render the names within PREWARM_NAMES of drink `index` (cache hits for those already done)."""
+        reach = min(PREWARM_NAMES, (TEXT_CACHE_SIZE - 1) // 2, len(images) // 2)
+        for offset in range(-reach, reach + 1):
+            render_text(display_name(images.filenames[(index + offset) % len(images)]), normal_text_size)
+
+    clear_text_cache()
+    prewarm_names(current_index)
+
+    # The pour runs on a background thread so the screen stays live and a
+    # tap anywhere during the pour acts as an emergency stop.
+    pour_state = {"thread": None, "overlay": None, "spinner": None, "progress": None, "result": None}
+    # Message shown over the carousel until `until` (pygame ticks).
+    notice = {"text": None, "until": 0}
+
+    def start_pour(filename, mode, overlay, spinner=None):
+        recipe = parse_drink(filename)
+        if not recipe:
+            print(f"No recipe found for {filename}")
+            return
+
+        def pour():
+            try:
+                pour_state["result"] = pour_service.make_drink(CONFIG_FILE, recipe.as_dict(), mode, on_event=progress.on_event, source="kiosk")
+            except Exception as e:
+                print("Error while pouring:", e)
+
+        progress = PourProgress()
+        pour_state["overlay"] = overlay
+        pour_state["spinner"] = spinner
+        pour_state["progress"] = progress
+        pour_state["result"] = None
+        pour_state["thread"] = threading.Thread(target=pour, daemon=True)
+        pour_state["thread"].start()
+
+    def pour_selected(mode):
+        if pouring_img:
+            start_pour(current_filename, mode, pouring_img, loading_img)
+
+    def select(index):
+        """Make drink `index` current (end of a swipe)."""
+        nonlocal current_index, current_img, current_filename, dirty
+        current_index = index % len(images)
+        images.focus(current_index)
+        current_img, current_filename = images[current_index]
+        write_selection(current_filename)
+        prewarm_names(current_index)
+        tweens.set("carousel", 0)
+        dirty = [full_screen]
+        # Animate both extra logos zooming together. NO STUDIP ANIMATION -tater
+        #animate_both_logos_zoom(tweens, base_size=150, target_size=175, duration=300)
+
+    # Only the regions listed in `dirty` are redrawn and pushed to the
+    # display. Drags and animations only touch the carousel band; everything
+    # else (new selection, end of a pour) repaints the whole screen.
+    full_screen = screen.get_rect()
+    carousel_rect = pygame.Rect(0, (screen_height - current_img.get_height()) // 2, screen_width, current_img.get_height())
+    # Everything a tween can move: the carousel, the mode logos and the name.
+    animated_rect = carousel_rect.union(pygame.Rect(0, text_position[1] - normal_text_size, screen_width, normal_text_size * 2))
+    overlay_rect = pygame.Rect(0, 0, 320, 32)
+    dirty = [full_screen]
+
+    def draw_logo(logo, rect, name):
+        size = int(tweens.get(name, logo_size))
+        if size != logo_size:
+            profiler.lap("blit")
+            logo = sprites.scaled(name, size)
+            profiler.lap("scale")
+        screen.blit(logo, logo.get_rect(center=rect.center))
+
+    def draw_scene(rects):
+        """Composite the carousel, name and mode logos (with any running tweens) into `rects`."""
+        if profiler.overlay:
+            rects = rects + [overlay_rect]
+        screen.set_clip(rects[0].unionall(rects[1:]))
+        if background:
+            screen.blit(background, (0, 0))
+        else:
+            screen.fill((0, 0, 0))
+        offset = drag_offset if dragging else tweens.get("carousel", 0)
+        screen.blit(current_img, (current_img.get_rect(center=(screen_size[0] // 2 + offset, screen_size[1] // 2))))
+        if offset < 0:
+            next_img, _ = images[(current_index + 1) % len(images)]
+            screen.blit(next_img, (current_img.get_rect(center=(screen_size[0] // 2 + offset + spacing, screen_size[1] // 2))))
+        elif offset > 0:
+            prev_img, _ = images[(current_index - 1) % len(images)]
+            screen.blit(prev_img, (current_img.get_rect(center=(screen_size[0] // 2 + offset - spacing, screen_size[1] // 2))))
+        profiler.lap("blit")
+        text_surface = render_text(display_name(current_filename), int(tweens.get("text", normal_text_size)))
+        text_rect = text_surface.get_rect(center=text_position)
+        screen.blit(text_surface, text_rect)
+        profiler.lap("text")
+        # Draw extra logos at their base (or animated) size.
+        if single_logo:
+            draw_logo(single_logo, single_rect, "single")
+        if double_logo:
+            draw_logo(double_logo, double_rect, "double")
+        if notice["text"]:
+            notice_size = 40
+            notice_surface = render_text(notice["text"], notice_size, (255, 220, 120))
+            while notice_surface.get_width() > screen_width - 40 and notice_size > 20:
+                notice_size -= 4  # shrink long notices to fit the screen
+                notice_surface = render_text(notice["text"], notice_size, (255, 220, 120))
+            notice_rect = notice_surface.get_rect(center=(screen_width // 2, int(screen_height * 0.1)))
+            screen.fill((0, 0, 0), notice_rect.inflate(24, 16))
+            screen.blit(notice_surface, notice_rect)
+        if profiler.overlay:
+            # Not through render_text: this changes every frame and would flush the cache.
+            screen.fill((0, 0, 0), overlay_rect)
+            screen.blit(get_font(24).render(profiler.overlay_text(), True, (0, 255, 0)), (8, 8))
+        screen.set_clip(None)
+        profiler.lap("blit")
+        pygame.display.update(rects)
+        profiler.lap("present")
+
+    # Pick up recipes and logos generated in the WebUI while running. The
+    # watcher thread only posts an event; changes are applied between drags
+    # and pours so the carousel never shifts under the user's finger.
+    parse_drink(current_filename)
+    cocktail_index.watch(["drink_logos"], lambda: pygame.event.post(pygame.event.Event(MENU_CHANGED)),
+                         revision=lambda: (store.revision("cocktails"), store.revision("pumps"), store.revision("aliases")))
+    menu_changed = False
+
     running = True
     while running:
-        for event in pygame.event.get():
+        if pour_state["thread"]:
+            if pour_state["thread"].is_alive():
+                profiler.start_frame()
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        pour_service.emergency_stop()
+                        running = False
+                    elif event.type == MENU_CHANGED:
+                        menu_changed = True
+                    elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.FINGERDOWN) or (event.type == pygame.KEYDOWN and event.key in (pygame.K_ESCAPE, pygame.K_SPACE)):
+                        pour_service.emergency_stop()
+                profiler.lap("events")
+                fraction, pouring = pour_state["progress"].snapshot()
+                status = "Pouring " + ", ".join(pouring) if pouring else ""
+                angle = -(pygame.time.get_ticks() * SPINNER_SPEED / 1000) % 360
+                loading_frame = sprites.rotated("spinner", angle) if pour_state["spinner"] else None
+                draw_pour_frame(screen, pour_state["overlay"], loading_frame, fraction, status, background)
+                profiler.lap("pour")
+                profiler.end_frame()
+                clock.tick(POUR_FRAME_RATE)
+                continue
+            result = pour_state["result"]
+            if result and result.get("short"):
+                short = ", ".join(f"{entry.get('ingredient', label)} ({label})" for label, entry in result["short"].items())
+                print("Not poured, not enough left:", short)
+                notice.update(text=f"Not enough {short} left - please refill", until=pygame.time.get_ticks() + NOTICE_MS)
+            elif result and result.get("cancelled"):
+                print("Pour stopped. Poured so far:", result.get("poured"))
+            pour_state["thread"] = None
+            dragging = False
+            drag_offset = 0
+            dirty = [full_screen]
+
+        if notice["text"] and pygame.time.get_ticks() >= notice["until"]:
+            notice["text"] = None
+            dirty = [full_screen]
+
+        # Idle: sleep until input arrives (or a notice expires). Dragging, animating or pending redraws: poll.
+        notice_ms = max(1, notice["until"] - pygame.time.get_ticks()) if notice["text"] else None
+        events = pygame.event.get() if dragging or dirty or tweens.running() else wait_for_events(notice_ms)
+        profiler.start_frame()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            if event.type == MENU_CHANGED:
+                menu_changed = True
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_q:
                     running = False
-            if event.type == pygame.MOUSEBUTTONDOWN:
+            gesture = gestures.handle(event)
+            if not gesture:
+                continue
+            kind, detail = gesture
+            if kind == "press":
+                if tweens.running("carousel"):
+                    # Touching during a slide lands it right away.
+                    tweens.finish("carousel")
+                    dirty = [full_screen]
                 dragging = True
-                drag_start_x = event.pos[0]
-            if event.type == pygame.MOUSEMOTION and dragging:
-                current_x = event.pos[0]
-                drag_offset = current_x - drag_start_x
-            if event.type == pygame.MOUSEBUTTONUP and dragging:
-                # If it's a click (minimal drag), check extra logos.
-                if abs(drag_offset) < 10:
-                    pos = event.pos
-                    if single_rect.collidepoint(pos):
-                        # Animate single logo click
-                        if single_logo:
-                            animate_logo_click(screen, single_logo, single_rect, base_size=150, target_size=220, duration=150, background=background, current_img=current_img, screen_size=screen_size)
-                        try:
-                            pouring_img = pygame.image.load("pouring.png")
-                            pouring_img = pygame.transform.scale(pouring_img, screen_size)
-                        except Exception as e:
-                            print("Error loading pouring.png:", e)
-                            pouring_img = None
-                        if pouring_img:
-                            screen.blit(pouring_img, (0, 0))
-                            controller.make_drink(CONFIG_FILE, parse_drink(current_filename), "single")
-                            #show_pouring_and_loading(screen, pouring_img, loading_img, duration_sec=10, background=background)
-                    elif double_rect.collidepoint(pos):
-                        # Animate double logo click
-                        if double_logo:
-                            animate_logo_click(screen, double_logo, double_rect, base_size=150, target_size=220, duration=150, background=background, current_img=current_img, screen_size=screen_size)
-                        try:
-                            pouring_img = pygame.image.load("pouring.png")
-                            pouring_img = pygame.transform.scale(pouring_img, screen_size)
-                        except Exception as e:
-                            print("Error loading pouring.png:", e)
-                            pouring_img = None
-                        try:
-                            loading_img = pygame.image.load("loading.png")
-                            loading_img = pygame.transform.scale(loading_img, (720,720))
-                        except Exception as e:
-                            print("Error loading loading.png:", e)
-                            loading_img = None
-                        if pouring_img and loading_img:
-                            screen.blit(pouring_img, (0, 0))
-                            controller.make_drink(CONFIG_FILE, parse_drink(current_filename), "double")
-                            #show_pouring_and_loading(screen, pouring_img, loading_img, duration_sec=30, background=background)
-                    dragging = False
-                    drag_offset = 0
-                    continue  # Skip further swipe handling.
-                # Otherwise, it's a swipe.
-                if abs(drag_offset) > screen_width / 2:
-                    if drag_offset < 0:
-                        target_offset = -screen_width
-                        new_index = (current_index + 1) % len(images)
+                continue
+            if not dragging:
+                continue
+            if kind == "tap":
+                # A click (minimal drag): check extra logos.
+                if single_rect.collidepoint(detail):
+                    # Pop the single logo, then pour
+                    if single_logo:
+                        animate_logo_click(tweens, "single", base_size=logo_size, target_size=220, duration=150, on_done=lambda: pour_selected("single"))
                     else:
-                        target_offset = screen_width
-                        new_index = (current_index - 1) % len(images)
-                    start_offset = drag_offset
-                    duration = 300
-                    start_time = pygame.time.get_ticks()
-                    while True:
-                        elapsed = pygame.time.get_ticks() - start_time
-                        progress = min(elapsed / duration, 1.0)
-                        current_offset = start_offset + (target_offset - start_offset) * progress
-                        if background:
-                            screen.blit(background, (0, 0))
-                        else:
-                            screen.fill((0, 0, 0))
-                        screen.blit(current_img, (current_img.get_rect(center=(screen_size[0] // 2 + current_offset, screen_size[1] // 2))))
-                        if drag_offset < 0:
-                            next_img, _ = images[(current_index + 1) % len(images)]
-                            screen.blit(next_img, (current_img.get_rect(center=(screen_size[0] // 2 + current_offset + screen_width / 1.5, screen_size[1] // 2))))
-                        else:
-                            prev_img, _ = images[(current_index - 1) % len(images)]
-                            screen.blit(prev_img, (current_img.get_rect(center=(screen_size[0] // 2 + current_offset - screen_width / 1.5, screen_size[1] // 2))))
-                        # Draw overlay text at normal size.
-                        font = pygame.font.SysFont(None, normal_text_size)
-                        drink_name = os.path.splitext(current_filename)[0].replace('_', ' ').title()
-                        text_surface = font.render(drink_name, True, (255, 255, 255))
-                        text_rect = text_surface.get_rect(center=text_position)
-                        screen.blit(text_surface, text_rect)
-                        # Draw extra logos at their current (base) size.
-                        if single_logo:
-                            screen.blit(single_logo, single_rect)
-                        if double_logo:
-                            screen.blit(double_logo, double_rect)
-                        pygame.display.flip()
-                        if progress >= 1.0:
-                            break
-                        clock.tick(60)
-                    current_index = new_index
-                    current_img, current_filename = images[current_index]
-                    write_selection(current_filename)
-                    # Animate both extra logos zooming together. NO STUDIP ANIMATION -tater
-                    #if single_logo and double_logo:
-                        #animate_both_logos_zoom(screen, single_logo, double_logo, single_rect, double_rect, base_size=150, target_size=175, duration=300, background=background, current_img=current_img)
+                        pour_selected("single")
+                elif double_rect.collidepoint(detail):
+                    # Pop the double logo, then pour
+                    if double_logo:
+                        animate_logo_click(tweens, "double", base_size=logo_size, target_size=220, duration=150, on_done=lambda: pour_selected("double"))
+                    else:
+                        pour_selected("double")
+                dirty = [full_screen]
+            elif kind == "swipe":
+                # Long drag or flick: slide the neighbour into place, as fast as the flick.
+                step = detail
+                target = -step * spacing
+                duration = gestures.slide_ms(target - drag_offset, SWIPE_MS)
+                tweens.start("carousel", drag_offset, target, duration, on_done=lambda step=step: select(current_index + step))
+            else:
+                # Snap back if swipe is insufficient.
+                tweens.start("carousel", drag_offset, 0, SWIPE_MS)
+            dragging = False
+            drag_offset = 0
+
+        # All motion events of this frame collapse into one position update.
+        if dragging and gestures.offset != drag_offset:
+            drag_offset = gestures.offset
+            dirty.append(carousel_rect)
+        profiler.lap("events")
+        if tweens.update():
+            dirty.append(animated_rect)
+        profiler.lap("tweens")
+
+        if menu_changed and not dragging and not tweens.running():
+            menu_changed = False
+            parse_drink(current_filename)  # reloads the index if the menu changed
+            added, removed = images.refresh()
+            if added or removed:
+                print(f"Menu updated: {len(added)} logo(s) added, {len(removed)} removed.")
+                if not images:
+                    print("No cocktail logos left in drink_logos")
+                    running = False
+                    continue
+                # Stay on the same drink if it is still there.
+                if current_filename in images.filenames:
+                    current_index = images.filenames.index(current_filename)
                 else:
-                    # Animate snapping back if swipe is insufficient.
-                    start_offset = drag_offset
-                    duration = 300
-                    start_time = pygame.time.get_ticks()
-                    while True:
-                        elapsed = pygame.time.get_ticks() - start_time
-                        progress = min(elapsed / duration, 1.0)
-                        current_offset = start_offset * (1 - progress)
-                        if background:
-                            screen.blit(background, (0, 0))
-                        else:
-                            screen.fill((0, 0, 0))
-                        screen.blit(current_img, (current_img.get_rect(center=(screen_size[0] // 2 + current_offset, screen_size[1] // 2))))
-                        font = pygame.font.SysFont(None, normal_text_size)
-                        drink_name = os.path.splitext(current_filename)[0].replace('_', ' ').title()
-                        text_surface = font.render(drink_name, True, (255, 255, 255))
-                        text_rect = text_surface.get_rect(center=text_position)
-                        screen.blit(text_surface, text_rect)
-                        # Draw extra logos.
-                        if single_logo:
-                            screen.blit(single_logo, single_rect)
-                        if double_logo:
-                            screen.blit(double_logo, double_rect)
-                        pygame.display.flip()
-                        if progress >= 1.0:
-                            break
-                        clock.tick(60)
-                dragging = False
-                drag_offset = 0
-
-        # Main drawing (when not in special animation)
-        if background:
-            screen.blit(background, (0, 0))
-        else:
-            screen.fill((0, 0, 0))
-        if dragging:
-            screen.blit(current_img, (current_img.get_rect(center=(screen_size[0] // 2 + drag_offset, screen_size[1] // 2))))
-            if drag_offset < 0:
-                next_img, _ = images[(current_index + 1) % len(images)]
-                screen.blit(next_img, (current_img.get_rect(center=(screen_size[0] // 2 + drag_offset + screen_width / 1.5, screen_size[1] // 2))))
-            elif drag_offset > 0:
-                prev_img, _ = images[(current_index - 1) % len(images)]
-                screen.blit(prev_img, (current_img.get_rect(center=(screen_size[0] // 2 + drag_offset - screen_width / 1.5, screen_size[1] // 2))))
+                    current_index = min(current_index, len(images) - 1)
+                images.focus(current_index)
+                current_img, current_filename = images[current_index]
+                write_selection(current_filename)
+                prewarm_names(current_index)
+                dirty = [full_screen]
+            profiler.lap("menu")
+
+        # Main drawing (when not in special animation): only what changed.
+        if dirty:
+            draw_scene(dirty)
+            dirty = []
+            profiler.end_frame(input_latency=gestures.take_latency())
         else:
-            screen.blit(current_img, (current_img.get_rect(center=(screen_size[0] // 2, screen_size[1] // 2))))
-        font = pygame.font.SysFont(None, normal_text_size)
-        drink_name = os.path.splitext(current_filename)[0].replace('_', ' ').title()
-        text_surface = font.render(drink_name, True, (255, 255, 255))
-        text_rect = text_surface.get_rect(center=text_position)
-        screen.blit(text_surface, text_rect)
-        # Draw extra logos at their base size.
-        if single_logo:
-            screen.blit(single_logo, single_rect)
-        if double_logo:
-            screen.blit(double_logo, double_rect)
-        pygame.display.flip()
-        clock.tick(60)
+            gestures.take_latency()  # input that changed nothing on screen
+        if dragging or tweens.running():
+            clock.tick(FRAME_RATE)
+    profiler.write()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+# inventory.py
+"""
+Per-pump inventory: how much liquid is left behind each pump.
+
+The ledger lives in the store (store.py). A pump is tracked once its
+bottle is entered in the WebUI (Settings -> Inventory) or with
+store.set_inventory(); untracked pumps are never checked. After every
+drink, or every glass of a round, the controller takes what each pump
+actually poured out of the ledger (partial volumes if the pour was
+stopped), so it never drifts by a whole drink. Only pours on real pumps
+count: the sim and debug backends (hardware.py) leave the ledger alone.
+
+Before any pump starts, make_drink and make_round compare what the order
+needs with what is left (check()). INVENTORY_CHECK decides what happens
+when a pump is short: "reject" (default) refuses the order, "warn" only
+prints a warning and pours anyway, "off" skips the check.
+
+forecast() turns the draws of the last FORECAST_HOURS into a pour rate
+per pump and the hours until each bottle runs dry at that rate. The rate
+is taken over the time the draws actually cover, from the first draw in
+the window (at least FORECAST_MIN_MINUTES ago) to now, so it isn't
+underestimated early in the night.
+"""
+import os
+import time
+
+import store
+
+FORECAST_HOURS = 2         # recent window used for pour rates
+FORECAST_MIN_MINUTES = 15  # shortest span a rate is taken over, so one early pour isn't a huge rate
+LOG_DAYS = 30              # draws kept in the log
+LOW_FRACTION = 0.15        # a bottle below this share of its size counts as low
+
+
+def get_check_mode():
+    """INVENTORY_CHECK from the environment: "reject", "warn" or "off"."""
+    mode = os.getenv("INVENTORY_CHECK", "reject").strip().lower()
+    if mode not in ("reject", "warn", "off"):
+        print(f"Invalid INVENTORY_CHECK '{mode}', using 'reject'.")
+        return "reject"
+    return mode
+
+
+def needed_by_pump(jobs, count=1):
+    """{pump label: oz} for `count` glasses of a drink's scheduler jobs."""
+    needed = {}
+    for job in jobs:
+        needed[job["pump"]] = needed.get(job["pump"], 0.0) + job.get("oz", 0.0) * count
+    return needed
+
+
+def shortages(needed):
+    """
+    Tracked pumps that don't have enough for `needed` ({pump label: oz}):
+    {pump label: {"needed_oz", "remaining_oz"}}.
+    """
+    ledger = store.get_inventory()
+    short = {}
+    for label, oz in needed.items():
+        entry = ledger.get(label)
+        if entry is not None and oz > entry["remaining_oz"] + 1e-6:
+            short[label] = {"needed_oz": round(oz, 3), "remaining_oz": round(entry["remaining_oz"], 3)}
+    return short
+
+
+def check(needed, ingredients=None, mode=None):
+    """
+    Pre-pour check. Prints what is short and returns the shortages if the
+    order must be refused, or {} if it may go ahead. `ingredients` maps
+    pump labels to names for the messages.
+    """
+    mode = mode or get_check_mode()
+    if mode == "off":
+        return {}
+    short = shortages(needed)
+    for label, entry in short.items():
+        name = (ingredients or {}).get(label, label)
+        print(f"Not enough {name} ({label}): need {entry['needed_oz']:.2f} oz, "
+              f"{entry['remaining_oz']:.2f} oz left.")
+    return short if mode == "reject" else {}
+
+
+def poured_by_pump(jobs, result, count=1):
+    """
+    {pump label: oz} actually poured by a finished or cancelled pour
+    (`result` from run_pour_schedule / run_synchronized_pour).
+    """
+    if not result.get("cancelled"):
+        return needed_by_pump(jobs, count)
+    poured = result.get("poured", {})
+    return {job["pump"]: poured.get(job["ingredient"], 0.0) for job in jobs}
+
+
+def record(amounts):
+    """Take {pump label: oz} out of the ledger and log the draws."""
+    try:
+        store.draw_inventory(amounts, keep_seconds=LOG_DAYS * 86400)
+    except Exception as e:
+        # Never let bookkeeping break a pour that already happened.
+        print(f"Error updating inventory: {e}")
+
+
+def forecast(now=None):
+    """
+    Per tracked pump: {"remaining_oz", "capacity_oz", "rate_oz_per_hour",
+    "hours_left", "low"}. The rate covers the time since the first draw of
+    any pump in the last FORECAST_HOURS. hours_left is None while the pump
+    hasn't poured in that window.
+    """
+    now = time.time() if now is None else now
+    draws = store.inventory_draws(now - FORECAST_HOURS * 3600)
+    first = min((draw["first"] for draw in draws.values()), default=now)
+    hours = min(max(now - first, FORECAST_MIN_MINUTES * 60) / 3600, FORECAST_HOURS)
+    result = {}
+    for label, entry in store.get_inventory().items():
+        rate = draws[label]["oz"] / hours if label in draws else 0.0
+        capacity = entry["capacity_oz"]
+        result[label] = {
+            "remaining_oz": entry["remaining_oz"],
+            "capacity_oz": capacity,
+            "rate_oz_per_hour": rate,
+            "hours_left": entry["remaining_oz"] / rate if rate > 0 else None,
+            "low": bool(capacity) and entry["remaining_oz"] < capacity * LOW_FRACTION,
+        }
+    return result
@@ -0,0 +1,168 @@
+# logo_cache.py
+"""
+Lazy, windowed loading of the drink logos for the kiosk carousel.
+
+Instead of decoding and scaling every PNG in drink_logos/ before the first
+frame, LogoCarousel only keeps the logos around the current one in memory
+(previous, current, next by default) and loads the neighbours on a
+background thread while the current one is on screen.
+
+Scaled logos are also written to an on-disk cache (LOGO_CACHE_DIR) as raw
+RGBA pixels, keyed by the SHA-1 of the source PNG and the target size, so
+after the first run a logo is read straight into a surface without PNG
+decoding or scaling. Editing or replacing a PNG changes its hash, so stale
+entries are never used.
+
+LogoCarousel behaves like the old list of (surface, filename) pairs:
+len(carousel) and carousel[i] work, carousel.focus(i) moves the window and
+carousel.refresh() picks up logos added or removed while running.
+"""
+import os
+import queue
+import hashlib
+import threading
+import pygame
+
+LOGO_CACHE_DIR = os.getenv("LOGO_CACHE_DIR", ".logo_cache")
+WINDOW = 1  # logos kept on each side of the current one
+
+
+def file_hash(path):
+    """SHA-1 of the file contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_scaled(path, size, cache_dir=LOGO_CACHE_DIR):
+    """
+    The logo at `path` scaled to `size` and converted for fast blitting,
+    from the disk cache if possible. Returns None if the PNG can't be read.
+    """
+    width, height = size
+    try:
+        key = file_hash(path)
+    except OSError as e:
+        print(f"Error loading {path}: {e}")
+        return None
+    cached = os.path.join(cache_dir, f"{key}_{width}x{height}.rgba")
+    try:
+        with open(cached, "rb") as f:
+            image = pygame.image.frombuffer(f.read(), size, "RGBA")
+    except (OSError, ValueError):
+        try:
+            image = pygame.transform.scale(pygame.image.load(path), size)
+        except Exception as e:
+            print(f"Error loading {path}: {e}")
+            return None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write then rename so a half-written file is never read back.
+            with open(cached + ".tmp", "wb") as f:
+                f.write(pygame.image.tostring(image, "RGBA"))
+            os.replace(cached + ".tmp", cached)
+        except OSError as e:
+            print(f"Could not cache {path}: {e}")
+    if pygame.display.get_surface():
+        image = image.convert_alpha()
+    return image
+
+
+class LogoCarousel:
+    """
+    Logos in `directory`, decoded on demand around the current index.
+    `include(filename)`, if given, decides which logos are shown.
+    """
+
+    def __init__(self, directory, size, cache_dir=LOGO_CACHE_DIR, window=WINDOW, include=None):
+        self.directory = directory
+        self.include = include
+        self.size = (int(size[0]), int(size[1]))
+        self.cache_dir = cache_dir
+        self.window = window
+        self.filenames = self._list()
+        self._surfaces = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._current = 0
+        self._placeholder = pygame.Surface(self.size, pygame.SRCALPHA)
+        threading.Thread(target=self._prefetch, daemon=True).start()
+
+    def _list(self):
+        try:
+            filenames = sorted(f for f in os.listdir(self.directory) if f.lower().endswith(".png"))
+        except OSError as e:
+            print(f"Error listing {self.directory}: {e}")
+            return []
+        if self.include:
+            filenames = [f for f in filenames if self.include(f)]
+        return filenames
+
+    def refresh(self):
+        """
+        Pick up logos added to or removed from the directory (or newly
+        shown or hidden by `include`) since the last look. Loaded surfaces of unchanged logos are kept. Returns
+        (added, removed) filename lists.
+        """
+        filenames = self._list()
+        old = set(self.filenames)
+        added = [f for f in filenames if f not in old]
+        removed = [f for f in self.filenames if f not in set(filenames)]
+        self.filenames = filenames
+        with self._lock:
+            for filename in removed:
+                self._surfaces.pop(filename, None)
+        return added, removed
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __getitem__(self, index):
+        """(surface, filename) for `index`, loading it now if it isn't prefetched."""
+        filenames = self.filenames
+        filename = filenames[index % len(filenames)]
+        with self._lock:
+            surface = self._surfaces.get(filename)
+        if surface is None:
+            surface = self._load(filename)
+        return surface, filename
+
+    def _load(self, filename):
+        surface = load_scaled(os.path.join(self.directory, filename), self.size, self.cache_dir)
+        if surface is None:
+            surface = self._placeholder  # keep the carousel usable if one PNG is broken
+        with self._lock:
+            self._surfaces[filename] = surface
+        return surface
+
+    def wanted(self, index):
+        """Filenames in the window around `index`."""
+        filenames = self.filenames  # refresh() may swap the list from another thread
+        if not filenames:
+            return set()
+        return {filenames[(index + offset) % len(filenames)] for offset in range(-self.window, self.window + 1)}
+
+    def focus(self, index):
+        """Make `index` current: drop logos outside the window and prefetch the rest."""
+        self._current = index
+        wanted = self.wanted(index)
+        with self._lock:
+            for filename in list(self._surfaces):
+                if filename not in wanted:
+                    del self._surfaces[filename]
+            missing = [f for f in wanted if f not in self._surfaces]
+        for filename in missing:
+            self._queue.put(filename)
+
+    def _prefetch(self):
+        while True:
+            filename = self._queue.get()
+            # Skip work the user already swiped past.
+            if filename not in self.wanted(self._current):
+                continue
+            with self._lock:
+                loaded = filename in self._surfaces
+            if not loaded:
+                self._load(filename)
@@ -1,6 +1,16 @@
 # main.py
 import subprocess
 import sys
+import time
+
+import pour_service
+
+# Start the pour service first so it owns the GPIO pins for both front ends.
+service_process = subprocess.Popen([sys.executable, "pour_service.py"])
+for _ in range(50):
+    if pour_service.service_available():
+        break
+    time.sleep(0.1)
 
 # Launch the Pygame interface in a separate process.
 interface_process = subprocess.Popen([sys.executable, "interface.py"])
@@ -11,3 +21,5 @@ streamlit_process = subprocess.Popen(["streamlit", "run", "app.py"])
 # Wait for both processes to finish.
 interface_process.wait()
 streamlit_process.wait()
+service_process.terminate()
+service_process.wait()
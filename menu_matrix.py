@@ -0,0 +1,164 @@
+# menu_matrix.py
+"""
+Whole-menu questions answered with NumPy instead of loops over recipes.
+
+MenuMatrix holds the menu as a cocktail x ingredient matrix of ounces and
+the pump assignment as an ingredient x pump 0/1 matrix; their product is
+the cocktail x pump matrix of what each pump pours for each drink. From
+those, for thousands of recipes at once and in milliseconds:
+
+    feasible          which cocktails every pump needed is set up for
+    missing(name)     what a cocktail lacks
+    total_oz          volume per drink
+    pour_seconds()    pour time per drink (all pumps together, or layered)
+    usage(counts)     ounces drawn from each pump by a night's orders
+    what_if(changes)  the same menu with some pumps reassigned
+
+Ingredients are matched to pumps by canonical name (ingredients.py), like
+the pour plans. current() keeps one matrix for the store's menu, rebuilt
+when the menu, pumps or aliases change; the kiosk and the WebUI use it to
+hide drinks that can't be made.
+"""
+import copy
+import threading
+import numpy as np
+
+import store
+
+_current = {"key": None, "matrix": None}
+_current_lock = threading.Lock()
+
+
+class MenuMatrix:
+    """Cocktail x ingredient volumes plus an ingredient x pump assignment."""
+
+    def __init__(self, compiled, pump_config, registry):
+        self.registry = registry
+        self.names = [recipe.name for recipe in compiled]
+        self.rows = {}
+        for i, recipe in enumerate(compiled):
+            self.rows.setdefault(recipe.key, i)
+            self.rows.setdefault(store.safe_name(recipe.name), i)
+
+        self.ingredients = []   # canonical display names, one per column
+        self.columns = {}       # ingredient key -> column
+        rows, cols, amounts = [], [], []
+        unreadable = np.zeros(len(compiled), dtype=bool)
+        for i, recipe in enumerate(compiled):
+            for ingredient, oz in zip(recipe.ingredients, recipe.amounts):
+                if oz is None:
+                    unreadable[i] = True
+                    continue
+                key = registry.key(ingredient)
+                col = self.columns.get(key)
+                if col is None:
+                    col = self.columns[key] = len(self.ingredients)
+                    self.ingredients.append(registry.resolve(ingredient) or ingredient.strip())
+                rows.append(i)
+                cols.append(col)
+                amounts.append(oz)
+        self.volumes = np.zeros((len(compiled), len(self.ingredients)))
+        np.add.at(self.volumes, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), amounts)
+        self.unreadable = unreadable
+        self._assign(pump_config)
+
+    def _assign(self, pump_config):
+        """(Re)build the pump side: assignment matrix and everything derived from it."""
+        self.pump_config = dict(pump_config)
+        self.pumps = list(self.pump_config)
+        assignment = np.zeros((len(self.ingredients), len(self.pumps)))
+        for j, ingredient in enumerate(self.pump_config.values()):
+            col = self.columns.get(self.registry.key(ingredient)) if ingredient and ingredient.strip() else None
+            if col is not None and not assignment[col].any():  # first pump wins, as in the pour plans
+                assignment[col, j] = 1.0
+        self.assignment = assignment
+        self.pump_volumes = self.volumes @ assignment
+        self.uncovered = (self.volumes > 0) & ~assignment.any(axis=1)
+        self.feasible = ~self.uncovered.any(axis=1) & ~self.unreadable & (self.volumes.sum(axis=1) > 0)
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, name):
+        """Row of a cocktail by name or logo filename, or None."""
+        return self.rows.get(store.safe_name(name), self.rows.get(name.lower()))
+
+    @property
+    def total_oz(self):
+        """Ounces per drink (single), every ingredient counted."""
+        return self.volumes.sum(axis=1)
+
+    def pour_seconds(self, oz_coefficient, layered=False):
+        """
+        Seconds per single drink: the longest pump when all pumps run
+        together, or the sum when ingredients are poured one by one.
+        """
+        per_pump = self.pump_volumes * oz_coefficient
+        return per_pump.sum(axis=1) if layered else per_pump.max(axis=1, initial=0.0)
+
+    def is_feasible(self, name):
+        """True/False for a cocktail on this menu, None if it isn't on it."""
+        row = self.row(name)
+        return None if row is None else bool(self.feasible[row])
+
+    def available(self):
+        """Names of the cocktails that can be made, in menu order."""
+        return [self.names[i] for i in np.flatnonzero(self.feasible)]
+
+    def missing(self, name):
+        """Ingredients of a cocktail that no pump holds ([] if it can be made)."""
+        row = self.row(name)
+        if row is None:
+            return []
+        return [self.ingredients[col] for col in np.flatnonzero(self.uncovered[row])]
+
+    def _counts(self, counts):
+        if isinstance(counts, dict):
+            vector = np.zeros(len(self.names))
+            for name, count in counts.items():
+                row = self.row(name)
+                if row is not None:
+                    vector[row] += count
+            return vector
+        return np.asarray(counts, dtype=float)
+
+    def usage(self, counts):
+        """
+        Ounces each pump pours for `counts` single drinks: {name: count} or a
+        vector in menu order (a double counts as 2). Returns {pump label: oz}.
+        """
+        totals = self._counts(counts) @ self.pump_volumes
+        return {label: float(oz) for label, oz in zip(self.pumps, totals)}
+
+    def ingredient_usage(self, counts):
+        """Like usage(), per ingredient instead of per pump, including ingredients no pump holds."""
+        totals = self._counts(counts) @ self.volumes
+        return {ingredient: float(oz) for ingredient, oz in zip(self.ingredients, totals)}
+
+    def what_if(self, changes):
+        """
+        The same menu with pumps reassigned, e.g. {"Pump 4": "Mezcal"} (an
+        empty string frees a pump). Recipes are shared, only the pump side
+        is rebuilt.
+        """
+        other = copy.copy(self)
+        other._assign(dict(self.pump_config, **changes))
+        return other
+
+
+def build(compiled=None, pump_config=None, registry=None):
+    """A MenuMatrix for the given recipes/pumps, defaulting to what's in the store."""
+    return MenuMatrix(
+        store.get_recipes() if compiled is None else compiled,
+        store.get_pump_config() if pump_config is None else pump_config,
+        registry or store.ingredient_index(),
+    )
+
+
+def current():
+    """The matrix for the store's menu and pumps, rebuilt only when they change."""
+    key = (store.DB_FILE, store.revision("cocktails"), store.revision("pumps"), store.revision("aliases"))
+    with _current_lock:
+        if key != _current["key"]:
+            _current.update(key=key, matrix=build())
+        return _current["matrix"]
@@ -0,0 +1,190 @@
+# pour_plans.py
+"""
+Compiled pour plans for every cocktail in the store (store.py).
+
+Each plan lists the pump index, pin pair and pour seconds (single and
+double) for every ingredient, so make_drink can start pumps right away
+instead of re-reading the pump assignments and .env on every tap. Volumes
+come pre-compiled from the store (recipes.py), so no measurement string is
+parsed on the pour path, and ingredients are matched to pumps by their
+canonical name (ingredients.py), so spelling variants still pour. Plans are
+kept in memory and only rebuilt when the store's pump, alias or cocktail
+revision changes, or OZ_CALIBRATION changes.
+"""
+import os
+from dotenv import load_dotenv
+
+import controller
+import ingredients
+import recipes
+import store
+
+CONFIG_FILE = "pump_config.json"  # legacy name, still accepted by make_drink & co.
+ENV_FILE = ".env"
+DEFAULT_OZ_CALIBRATION = 8
+
+_env_mtime = -1  # never loaded yet
+_cache = {"key": None, "pump_index": {}, "plans": {}, "registry": None}
+
+
+def invalidate():
+    """Forget the compiled plans so the next lookup rebuilds them."""
+    _cache["key"] = None
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def load_env():
+    """Re-read .env, but only when it changed since the last call."""
+    global _env_mtime
+    mtime = _mtime(ENV_FILE)
+    if mtime != _env_mtime:
+        load_dotenv(override=True)
+        _env_mtime = mtime
+
+
+def get_oz_calibration():
+    """Seconds per ounce from OZ_CALIBRATION, or the default of 8."""
+    load_env()
+    value = os.getenv("OZ_CALIBRATION")
+    try:
+        return float(value) if value else DEFAULT_OZ_CALIBRATION
+    except ValueError:
+        print(f"Invalid OZ_CALIBRATION '{value}', using {DEFAULT_OZ_CALIBRATION}.")
+        return DEFAULT_OZ_CALIBRATION
+
+
+def _ingredient_key(registry, name):
+    return registry.key(name) if registry else ingredients.normalize(name)
+
+
+def build_pump_index(pump_config, registry=None):
+    """
+    Map ingredient key -> (pump label, pump index). Keys are canonical names
+    from `registry` (an ingredients.IngredientIndex), so "Tuquila" on a pump
+    and "Tequila" in a recipe meet; without one, just normalized names.
+    """
+    index = {}
+    for pump_label, ingredient_name in pump_config.items():
+        key = _ingredient_key(registry, ingredient_name)
+        if not key or key in index:
+            continue
+        try:
+            pump_index = int(pump_label.replace("Pump", "").strip()) - 1
+        except ValueError:
+            print(f"Could not parse pump label '{pump_label}'. Skipping.")
+            continue
+        if pump_index < 0 or pump_index >= len(controller.MOTORS):
+            print(f"Pump index {pump_index} out of range for '{ingredient_name}'. Skipping.")
+            continue
+        index[key] = (pump_label, pump_index)
+    return index
+
+
+def compile_recipe(recipe, pump_index, oz_coefficient, registry=None):
+    """
+    Turn a compiled recipes.Recipe into a pour plan:
+        {"name", "ingredients", "steps": [...], "skipped": [(ingredient, reason), ...]}
+    where each step holds pump, index, ia, ib, ingredient, oz, single and double seconds.
+    Ingredients that end up on the same pump (e.g. "Triple Sec" and
+    "Cointreau") are merged into one step, so a pump is only started once.
+    """
+    steps = []
+    by_pump = {}
+    skipped = []
+    for ingredient_name, oz_amount in zip(recipe.ingredients, recipe.amounts):
+        if oz_amount is None:
+            skipped.append((ingredient_name, "cannot parse measurement"))
+            continue
+
+        match = pump_index.get(_ingredient_key(registry, ingredient_name))
+        if not match:
+            skipped.append((ingredient_name, "no pump mapped"))
+            continue
+
+        pump_label, index = match
+        seconds = oz_amount * oz_coefficient
+        step = by_pump.get(pump_label)
+        if step:
+            step["ingredient"] += " + " + ingredient_name
+            step["oz"] += oz_amount
+            step["single"] += seconds
+            step["double"] += seconds * 2
+            continue
+        ia, ib = controller.MOTORS[index]
+        by_pump[pump_label] = {
+            "pump": pump_label,
+            "index": index,
+            "ia": ia,
+            "ib": ib,
+            "ingredient": ingredient_name,
+            "oz": oz_amount,
+            "single": seconds,
+            "double": seconds * 2,
+        }
+        steps.append(by_pump[pump_label])
+    return {
+        "name": recipe.name,
+        "ingredients": dict(zip(recipe.ingredients, recipe.measurements)),
+        "steps": steps,
+        "skipped": skipped,
+    }
+
+
+def get_plans(pump_config_path=CONFIG_FILE):
+    """
+    Return {lower-cased normal_name: plan} for every cocktail, rebuilding
+    only if the pump assignments, cocktail list or calibration changed.
+    Returns None if no pumps are configured yet.
+
+    `pump_config_path` is kept for callers written against pump_config.json;
+    the pump assignments now always come from the store.
+    """
+    oz_coefficient = get_oz_calibration()
+    key = (store.DB_FILE, store.revision("pumps"), store.revision("aliases"), store.revision("cocktails"), oz_coefficient)
+    if key == _cache["key"]:
+        return _cache["plans"]
+
+    pump_config = store.get_pump_config()
+    if not pump_config:
+        print(f"No pump configuration in {store.DB_FILE}.")
+        return None
+    registry = store.ingredient_index()
+    pump_index = build_pump_index(pump_config, registry)
+    plans = {}
+    for recipe in store.get_recipes():
+        plans[recipe.key] = compile_recipe(recipe, pump_index, oz_coefficient, registry)
+
+    _cache.update(key=key, pump_index=pump_index, plans=plans, oz_coefficient=oz_coefficient, registry=registry)
+    return plans
+
+
+def plan_for(recipe, pump_config_path=CONFIG_FILE):
+    """
+    Pour plan for `recipe` (a cocktail dict or recipes.Recipe). Cocktails
+    straight from the store come from the cache; edited recipes (e.g.
+    adjusted in the WebUI) are validated and compiled on the spot against
+    the cached pump index. Returns None if there is nothing to pour with.
+    """
+    plans = get_plans(pump_config_path)
+    if plans is None:
+        return None
+    if isinstance(recipe, recipes.Recipe):
+        plan = plans.get(recipe.key)
+        if plan and plan["ingredients"] == dict(zip(recipe.ingredients, recipe.measurements)):
+            return plan
+        return compile_recipe(recipe, _cache["pump_index"], _cache["oz_coefficient"], _cache["registry"])
+    plan = plans.get(recipe.get("normal_name", "").lower())
+    if plan and plan["ingredients"] == recipe.get("ingredients", {}):
+        return plan
+    try:
+        compiled = recipes.compile_cocktail(recipe)
+    except ValueError as e:
+        print(f"Invalid recipe {recipe.get('normal_name', '')!r}: {recipes.error_text(e)}")
+        return None
+    return compile_recipe(compiled, _cache["pump_index"], _cache["oz_coefficient"], _cache["registry"])
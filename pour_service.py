@@ -0,0 +1,314 @@
+# pour_service.py
+"""
+Resident pump controller service.
+
+Run `python pour_service.py` once (main.py does this for you). The service
+sets up GPIO a single time and then takes pour, prime and clean jobs from
+interface.py and app.py over a local Unix socket, so only one process ever
+drives the pins. Jobs run one at a time in arrival order; an identical
+prime/clean job that is still waiting in the queue is merged with the new
+request instead of running twice.
+
+Protocol: the client sends one JSON line describing the job ("pour",
+"round", "prime", "clean", or "stop" which bypasses the queue), e.g.
+    {"op": "pour", "recipe": {...}, "single_or_double": "double"}
+and the service answers with JSON lines of progress events ("queued",
+"started", "schedule", "pump_start", "pump_stop", "cancelled") ending with either
+{"event": "done", "result": ...} or {"event": "error", "message": ...}.
+
+The helper functions at the bottom (make_drink, make_round, prime_pumps,
+clean_pumps) are what the front ends call. If the service isn't running
+they fall back to driving the controller in-process, like before.
+"""
+import os
+import json
+import queue
+import signal
+import socket
+import socketserver
+import threading
+
+import telemetry
+
+SOCKET_PATH = os.getenv("TIPSY_SOCKET", "/tmp/tipsy.sock")
+CONFIG_FILE = "pump_config.json"
+
+# Ops that are safe to merge when an identical job is already waiting.
+MERGEABLE_OPS = ("prime", "clean")
+
+
+class Job:
+    """A queued request plus every client that is waiting on its events."""
+
+    def __init__(self, request):
+        self.request = request
+        self.listeners = []
+        self.started = False
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def add_listener(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def send(self, event):
+        with self.lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener.put(event)
+
+
+class PourService:
+    """Owns the GPIO pins and runs jobs one after another on a worker thread."""
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.waiting = []  # jobs queued but not started, for merging
+        self.waiting_lock = threading.Lock()
+        self.worker = threading.Thread(target=self._run_jobs, daemon=True)
+
+    def start(self):
+        import controller
+        self.controller = controller
+        controller.hold_gpio()
+        # Compile every pour plan up front so the first tap starts pumps immediately.
+        import pour_plans
+        pour_plans.get_plans()
+        self.worker.start()
+
+    def stop(self):
+        self.controller.release_gpio()
+
+    def emergency_stop(self):
+        """Stop the pumps immediately and drop every job still waiting in the queue."""
+        with self.waiting_lock:
+            # Under the lock, so a job is either still waiting (and dropped)
+            # or already accepted (and the stop is kept for it).
+            self.controller.emergency_stop()
+            dropped = list(self.waiting)
+            for job in dropped:
+                job.cancelled = True
+        for job in dropped:
+            job.send({"event": "error", "message": "Cancelled by emergency stop"})
+        return {"dropped": len(dropped)}
+
+    def submit(self, request, listener):
+        """Queue `request` (or merge it with a waiting duplicate) and register `listener`."""
+        with self.waiting_lock:
+            if request.get("op") in MERGEABLE_OPS:
+                for job in self.waiting:
+                    if job.request == request:
+                        job.add_listener(listener)
+                        listener.put({"event": "queued", "merged": True, "position": self.waiting.index(job)})
+                        return job
+            job = Job(request)
+            job.add_listener(listener)
+            self.waiting.append(job)
+            listener.put({"event": "queued", "merged": False, "position": len(self.waiting) - 1})
+            self.jobs.put(job)
+        return job
+
+    def _run_jobs(self):
+        while True:
+            job = self.jobs.get()
+            with self.waiting_lock:
+                self.waiting.remove(job)
+                job.started = True
+                if not job.cancelled:
+                    self.controller.accept_job()
+            if job.cancelled:
+                continue
+            job.send({"event": "started", "op": job.request.get("op")})
+            try:
+                result = self._execute(job.request, job.send)
+                job.send({"event": "done", "result": result})
+            except Exception as e:
+                print(f"Error running {job.request.get('op')} job: {e}")
+                job.send({"event": "error", "message": str(e)})
+
+    def _execute(self, request, on_event):
+        op = request.get("op")
+        if op == "pour":
+            return self.controller.make_drink(
+                request.get("pump_config_path", CONFIG_FILE),
+                request["recipe"],
+                request.get("single_or_double", "single"),
+                max_concurrent=request.get("max_concurrent"),
+                layered=request.get("layered", False),
+                on_event=on_event,
+                source=request.get("source"),
+                synchronized=request.get("synchronized"),
+            )
+        if op == "round":
+            return self.controller.make_round(
+                request.get("pump_config_path", CONFIG_FILE),
+                request["orders"],
+                max_concurrent=request.get("max_concurrent"),
+                swap_seconds=request.get("swap_seconds", self.controller.GLASS_SWAP_SECONDS),
+                on_event=on_event,
+                source=request.get("source"),
+            )
+        if op == "prime":
+            return self.controller.prime_pumps(
+                request.get("duration", 10),
+                durations=request.get("durations"),
+                current_budget=request.get("current_budget"),
+                on_event=on_event,
+            )
+        if op == "clean":
+            return self.controller.clean_pumps(
+                request.get("duration", 10),
+                durations=request.get("durations"),
+                current_budget=request.get("current_budget"),
+                pulse=request.get("pulse"),
+                on_event=on_event,
+            )
+        raise ValueError(f"Unknown op '{op}'")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self._write({"event": "error", "message": f"Bad request: {e}"})
+            return
+
+        if request.get("op") == "stop":
+            # Emergency stops skip the queue entirely.
+            self._write({"event": "done", "result": self.server.service.emergency_stop()})
+            return
+
+        listener = queue.Queue()
+        self.server.service.submit(request, listener)
+        while True:
+            event = listener.get()
+            try:
+                self._write(event)
+            except OSError:
+                # Client went away; the job keeps running for anyone else.
+                return
+            if event["event"] in ("done", "error"):
+                return
+
+    def _write(self, event):
+        self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(socket_path=SOCKET_PATH):
+    """Run the service until interrupted."""
+    if os.path.exists(socket_path):
+        if service_available(socket_path):
+            print(f"Pour service already running on {socket_path}")
+            return
+        os.remove(socket_path)
+
+    service = PourService()
+    service.start()
+    telemetry.serve_metrics()
+    server = _Server(socket_path, _RequestHandler)
+    server.service = service
+    print(f"Pour service listening on {socket_path}")
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        telemetry.flush()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# ---------- Client side ----------
+
+def service_available(socket_path=SOCKET_PATH):
+    """True if a pour service is listening on `socket_path`."""
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def submit(request, on_event=None, socket_path=SOCKET_PATH):
+    """
+    Send one job to the service and block until it finishes, passing each
+    progress event to `on_event`. Returns the job's result; raises
+    RuntimeError if the service reports an error.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as stream:
+            for line in stream:
+                event = json.loads(line)
+                if on_event:
+                    on_event(event)
+                if event["event"] == "done":
+                    return event.get("result")
+                if event["event"] == "error":
+                    raise RuntimeError(event.get("message", "pour service error"))
+    raise RuntimeError("Pour service closed the connection before the job finished")
+
+
+def _run(request, local_call, on_event):
+    if service_available():
+        return submit(request, on_event=on_event)
+    # No service running: drive the pumps from this process as before.
+    import controller
+    return local_call(controller)
+
+
+def make_drink(pump_config_path, recipe, single_or_double="single", on_event=None, **options):
+    """Pour a drink through the service (same arguments as controller.make_drink)."""
+    request = dict(options, op="pour", pump_config_path=pump_config_path, recipe=recipe, single_or_double=single_or_double)
+    return _run(request, lambda c: c.make_drink(pump_config_path, recipe, single_or_double, on_event=on_event, **options), on_event)
+
+
+def make_round(pump_config_path, orders, on_event=None, **options):
+    """Pour a round through the service (same arguments as controller.make_round)."""
+    request = dict(options, op="round", pump_config_path=pump_config_path, orders=[list(order) for order in orders])
+    return _run(request, lambda c: c.make_round(pump_config_path, orders, on_event=on_event, **options), on_event)
+
+
+def emergency_stop():
+    """Stop all pumps now, cancelling the running job and anything queued."""
+    if service_available():
+        return submit({"op": "stop"})
+    import controller
+    controller.emergency_stop()
+    return {"dropped": 0}
+
+
+def prime_pumps(duration, on_event=None, **options):
+    """Prime all pumps through the service (same arguments as controller.prime_pumps)."""
+    request = dict(options, op="prime", duration=duration)
+    return _run(request, lambda c: c.prime_pumps(duration, on_event=on_event, **options), on_event)
+
+
+def clean_pumps(duration=10, on_event=None, **options):
+    """Clean all pumps through the service (same arguments as controller.clean_pumps)."""
+    request = dict(options, op="clean", duration=duration)
+    return _run(request, lambda c: c.clean_pumps(duration, on_event=on_event, **options), on_event)
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,203 @@
+# recipes.py
+"""
+Recipe compiler: validates cocktails once, when they are saved, and turns
+their free-text measurements into numeric volumes.
+
+Incoming cocktails (from the AI generator, the WebUI or the legacy
+cocktails.json) are checked against the Cocktail model and every
+measurement is normalised to fluid ounces, whatever unit it was written in:
+
+    "2 oz", "1 1/2 oz", "½ oz", "45 ml", "4.5 cl", "1 tsp", "2 dashes", "3"
+
+(a bare number means ounces, as it always has). The result is a Recipe, a
+small __slots__ object with parallel tuples of ingredient names, original
+measurements and ounces. The store saves the ounces next to each
+measurement, so the controller, the kiosk and the WebUI all share the same
+numbers and nothing parses a measurement string on the pour path.
+Measurements that can't be understood are listed in Recipe.problems and
+reported when the recipe is saved, instead of being skipped silently
+mid-pour.
+"""
+import re
+import functools
+from pydantic import BaseModel, ValidationError, field_validator
+
+ML_PER_OZ = 29.5735
+
+# Fluid ounces per unit. Plurals and a trailing "." are accepted as well.
+UNITS = {
+    "oz": 1.0,
+    "ounce": 1.0,
+    "fl oz": 1.0,
+    "ml": 1 / ML_PER_OZ,
+    "cl": 10 / ML_PER_OZ,
+    "l": 1000 / ML_PER_OZ,
+    "tsp": 1 / 6,
+    "teaspoon": 1 / 6,
+    "tbsp": 1 / 2,
+    "tablespoon": 1 / 2,
+    "dash": 1 / 32,
+    "splash": 1 / 4,
+    "shot": 1.5,
+    "cup": 8.0,
+}
+FRACTIONS = {"¼": 0.25, "½": 0.5, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125}
+MEASUREMENT_CACHE_SIZE = 1024
+
+_MEASUREMENT = re.compile(
+    r"^(?P<whole>\d+(?:\.\d+)?|\.\d+)?\s*"
+    r"(?:(?P<num>\d+)\s*/\s*(?P<den>\d+)|(?P<glyph>[¼½¾⅓⅔⅛]))?\s*"
+    r"(?P<unit>[a-z][a-z. ]*?)?\.?$"
+)
+
+
+class Cocktail(BaseModel):
+    normal_name: str
+    fun_name: str = ""
+    ingredients: dict[str, str]
+
+    @field_validator("normal_name")
+    @classmethod
+    def name_not_blank(cls, value):
+        if not value.strip():
+            raise ValueError("normal_name must not be blank")
+        return value.strip()
+
+    @field_validator("ingredients", mode="before")
+    @classmethod
+    def measurements_as_text(cls, value):
+        # The generator sometimes answers {"Vodka": 2} instead of "2 oz".
+        if isinstance(value, dict):
+            return {str(k).strip(): str(v).strip() for k, v in value.items()}
+        return value
+
+
+class CocktailResponse(BaseModel):
+    cocktails: list[Cocktail]
+
+
+def _unit_factor(unit):
+    unit = " ".join(unit.replace(".", " ").split())
+    if unit in UNITS:
+        return UNITS[unit]
+    for suffix in ("es", "s"):
+        if unit.endswith(suffix) and unit[: -len(suffix)] in UNITS:
+            return UNITS[unit[: -len(suffix)]]
+    return None
+
+
+@functools.lru_cache(maxsize=MEASUREMENT_CACHE_SIZE)
+def parse_amount(measurement):
+    """Fluid ounces in a measurement like "1 1/2 oz" or "30 ml". Raises ValueError if it can't tell."""
+    text = str(measurement).strip().lower()
+    match = _MEASUREMENT.match(text)
+    if not match or not (match["whole"] or match["num"] or match["glyph"]):
+        raise ValueError(f"cannot parse measurement '{measurement}'")
+    amount = float(match["whole"] or 0)
+    if match["num"]:
+        if int(match["den"]) == 0:
+            raise ValueError(f"cannot parse measurement '{measurement}'")
+        amount += int(match["num"]) / int(match["den"])
+    elif match["glyph"]:
+        amount += FRACTIONS[match["glyph"]]
+    factor = 1.0
+    if match["unit"]:
+        factor = _unit_factor(match["unit"])
+        if factor is None:
+            raise ValueError(f"unknown unit '{match['unit'].strip()}'")
+    return amount * factor
+
+
+def format_oz(oz):
+    """Measurement text for an amount in ounces, e.g. 1.5 -> "1.5 oz"."""
+    return f"{round(oz, 2):g} oz"
+
+
+class Recipe:
+    """A validated cocktail with each ingredient's volume in ounces (None if it couldn't be read)."""
+
+    __slots__ = ("key", "name", "fun_name", "ingredients", "measurements", "amounts", "problems", "extra")
+
+    def __init__(self, name, fun_name, ingredients, measurements, amounts, extra=None):
+        self.key = name.lower()
+        self.name = name
+        self.fun_name = fun_name
+        self.ingredients = tuple(ingredients)
+        self.measurements = tuple(measurements)
+        self.amounts = tuple(amounts)
+        self.problems = ()
+        if None in self.amounts:
+            self.problems = tuple(
+                (ingredient, "cannot parse measurement") for ingredient, oz in zip(self.ingredients, self.amounts) if oz is None
+            )
+        self.extra = extra or {}
+
+    def __repr__(self):
+        return f"Recipe({self.name!r}, {dict(zip(self.ingredients, self.amounts))})"
+
+    def as_dict(self):
+        """The cocktail in its stored / wire shape: {"normal_name", "fun_name", "ingredients", ...}."""
+        cocktail = {"normal_name": self.name}
+        if self.fun_name:
+            cocktail["fun_name"] = self.fun_name
+        cocktail["ingredients"] = dict(zip(self.ingredients, self.measurements))
+        cocktail.update(self.extra)
+        return cocktail
+
+
+def error_text(error):
+    """One-line description of a validation error."""
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'cocktail'}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+def compile_cocktail(data):
+    """
+    Validate one cocktail dict (or Cocktail) and compile it into a Recipe.
+    Raises ValueError (pydantic.ValidationError) if it doesn't fit the model.
+    """
+    cocktail = data if isinstance(data, Cocktail) else Cocktail.model_validate(data)
+    extra = {}
+    if isinstance(data, dict):
+        extra = {k: v for k, v in data.items() if k not in Cocktail.model_fields}
+    amounts = []
+    problems = []
+    for ingredient, measurement in cocktail.ingredients.items():
+        try:
+            amounts.append(parse_amount(measurement))
+        except ValueError as e:
+            amounts.append(None)
+            problems.append((ingredient, str(e)))
+    recipe = Recipe(cocktail.normal_name, cocktail.fun_name, cocktail.ingredients.keys(),
+                    cocktail.ingredients.values(), amounts, extra)
+    recipe.problems = tuple(problems)
+    return recipe
+
+
+def compile_menu(data):
+    """
+    Compile a {"cocktails": [...]} menu. Returns (recipes, problems): cocktails
+    that fail validation are left out, and every rejected cocktail or
+    unreadable measurement is described in `problems`.
+    """
+    recipes = []
+    problems = []
+    cocktails = data.get("cocktails", []) if isinstance(data, dict) else []
+    if not isinstance(cocktails, list):
+        return [], ["'cocktails' is not a list"]
+    for position, cocktail in enumerate(cocktails):
+        try:
+            recipe = compile_cocktail(cocktail)
+        except ValueError as e:
+            name = cocktail.get("normal_name") if isinstance(cocktail, dict) else None
+            problems.append(f"Cocktail {name or position + 1!r} rejected: {error_text(e)}")
+            continue
+        recipes.append(recipe)
+        problems.extend(describe_problems(recipe))
+    return recipes, problems
+
+
+def describe_problems(recipe):
+    """Human-readable lines for a recipe's unreadable measurements."""
+    return [f"{recipe.name}: {ingredient} will not be poured ({reason})" for ingredient, reason in recipe.problems]
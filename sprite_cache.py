@@ -0,0 +1,89 @@
+# sprite_cache.py
+"""
+Pre-transformed animation frames for the kiosk UI.
+
+Animations used to run pygame.transform.scale / rotate on the source image
+every frame (the logo pop, the pouring spinner). SpriteCache builds each
+scaled size or rotation step once, the first time an animation needs it,
+and keeps the frames in an LRU bounded by SPRITE_CACHE_MB, so drawing an
+animation frame is a plain blit.
+
+Rotations are quantised to SPINNER_FRAMES steps per turn, and crop_centered()
+trims a spinner to its visible pixels first, so a full turn of frames stays
+small.
+"""
+import os
+from collections import OrderedDict
+import pygame
+
+SPRITE_CACHE_MB = int(os.getenv("SPRITE_CACHE_MB", 64))
+SPINNER_FRAMES = 60  # rotation steps per full turn (6 degrees each)
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+def crop_centered(surface):
+    """
+    The smallest square around the centre of `surface` that still holds every
+    visible pixel. Rotating the crop looks the same as rotating the whole
+    image about its centre, for a fraction of the work and memory.
+    """
+    width, height = surface.get_size()
+    visible = surface.get_bounding_rect()
+    if not visible.width or not visible.height:
+        return surface
+    cx, cy = width // 2, height // 2
+    half = max(cx - visible.left, visible.right - cx, cy - visible.top, visible.bottom - cy)
+    square = pygame.Rect(cx - half, cy - half, half * 2, half * 2).clip(surface.get_rect())
+    return surface.subsurface(square).copy()
+
+
+class SpriteCache:
+    """Scaled and rotated frames of named source images, built lazily, LRU-bounded by bytes."""
+
+    def __init__(self, max_bytes=SPRITE_CACHE_MB * 1024 * 1024, rotation_steps=SPINNER_FRAMES):
+        self.max_bytes = max_bytes
+        self.rotation_steps = rotation_steps
+        self.sources = {}
+        self.frames = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def add_source(self, name, surface):
+        """Register (or replace) the image animated under `name`."""
+        self.sources[name] = surface
+        for key in [key for key in self.frames if key[0] == name]:
+            self.bytes -= surface_bytes(self.frames.pop(key))
+
+    def _get(self, key, build):
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return frame
+        self.misses += 1
+        frame = build()
+        self.frames[key] = frame
+        self.bytes += surface_bytes(frame)
+        while self.bytes > self.max_bytes and len(self.frames) > 1:
+            _, old = self.frames.popitem(last=False)
+            self.bytes -= surface_bytes(old)
+        return frame
+
+    def scaled(self, name, size):
+        """Source `name` scaled to a `size` x `size` square."""
+        source = self.sources[name]
+        if source.get_size() == (size, size):
+            return source
+        return self._get((name, "scale", size), lambda: pygame.transform.scale(source, (size, size)))
+
+    def rotated(self, name, angle):
+        """Source `name` rotated by `angle` degrees, rounded to the nearest rotation step."""
+        step = round(angle * self.rotation_steps / 360) % self.rotation_steps
+        source = self.sources[name]
+        if step == 0:
+            return source
+        return self._get((name, "rotate", step), lambda: pygame.transform.rotate(source, step * 360 / self.rotation_steps))
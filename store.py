@@ -0,0 +1,541 @@
+# store.py
+"""
+Transactional SQLite store for everything the WebUI, the touchscreen and
+the controller share:
+
+    cocktails     one row per cocktail (indexed by safe name)
+    ingredients   one row per ingredient line of a cocktail (indexed by name),
+                  with the measurement text and its volume in ounces
+    pumps         pump label -> ingredient assignment
+    ingredient_aliases  extra spellings for ingredients.IngredientIndex
+    inventory     ounces left (and bottle size) behind each tracked pump
+    inventory_log every draw from a pump, for depletion forecasts
+    ui_state      small key/value settings, e.g. the selected cocktail
+    revisions     a counter per table, bumped on every write
+
+The database (tipsy.db, or TIPSY_DB) runs in WAL mode, so the WebUI can save
+while the screen and the pour service read without ever seeing a
+half-written menu, and every save is one transaction. Readers that cache
+(pour_plans, cocktail_index) compare revision() to know when to reload,
+which is a single indexed lookup.
+
+Cocktails are validated and compiled by recipes.py on the way in, and
+read back as recipes.Recipe objects (get_recipes) or in the old JSON shape
+(get_cocktails).
+
+On first use the store imports the old cocktails.json, pump_config.json and
+selected_*.txt files once; they are left on disk as a backup but no longer
+read.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+import contextlib
+
+import recipes
+import ingredients
+
+DB_FILE = os.getenv("TIPSY_DB", "tipsy.db")
+LEGACY_COCKTAILS_FILE = "cocktails.json"
+LEGACY_CONFIG_FILE = "pump_config.json"
+LEGACY_STATE_FILES = {"selected_cocktail": "selected_cocktail.txt", "selected_mode": "selected_mode.txt"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cocktails (
+    id INTEGER PRIMARY KEY,
+    safe_name TEXT NOT NULL UNIQUE,
+    normal_name TEXT NOT NULL,
+    fun_name TEXT,
+    position INTEGER NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS cocktails_position ON cocktails(position);
+CREATE TABLE IF NOT EXISTS ingredients (
+    cocktail_id INTEGER NOT NULL REFERENCES cocktails(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    measurement TEXT NOT NULL,
+    oz REAL,
+    PRIMARY KEY (cocktail_id, position)
+);
+CREATE INDEX IF NOT EXISTS ingredients_name ON ingredients(name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS pumps (
+    label TEXT PRIMARY KEY,
+    ingredient TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pumps_ingredient ON pumps(ingredient COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS ui_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS ingredient_aliases (
+    alias TEXT PRIMARY KEY COLLATE NOCASE,
+    ingredient TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inventory (
+    label TEXT PRIMARY KEY,
+    capacity_oz REAL,
+    remaining_oz REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inventory_log (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    label TEXT NOT NULL,
+    oz REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inventory_log_ts ON inventory_log(ts, label);
+CREATE TABLE IF NOT EXISTS revisions (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+_ingredient_index = {"key": None, "index": None}
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def safe_name(name):
+    """"Classic Whisky Sour" or "classic_whisky_sour.png" -> "classic_whisky_sour"."""
+    name = name.strip()
+    if name.lower().endswith(".png"):
+        name = name[:-4]
+    return name.lower().replace(" ", "_")
+
+
+def connect():
+    """This thread's connection to DB_FILE (created, and migrated, on first use)."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    db = connections.get(DB_FILE)
+    if db is None:
+        # Autocommit mode: transactions are opened explicitly in transaction().
+        db = sqlite3.connect(DB_FILE, timeout=10, isolation_level=None, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        connections[DB_FILE] = db
+        with _migrate_lock:
+            if DB_FILE not in _migrated:
+                db.executescript(SCHEMA)
+                _upgrade(db)
+                migrate(db)
+                _migrated.add(DB_FILE)
+    return db
+
+
+@contextlib.contextmanager
+def transaction():
+    """`with transaction() as db:` runs the block as one write transaction."""
+    db = connect()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def _bump(db, name):
+    db.execute(
+        "INSERT INTO revisions (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (name,),
+    )
+
+
+def revision(name):
+    """Change counter for "cocktails", "pumps", "aliases", "inventory" or "ui_state"; compare it to know when to reload."""
+    row = connect().execute("SELECT value FROM revisions WHERE name = ?", (name,)).fetchone()
+    return row["value"] if row else 0
+
+
+def _upgrade(db):
+    """Bring databases created by older versions up to the current schema."""
+    columns = [row["name"] for row in db.execute("PRAGMA table_info(ingredients)")]
+    if "oz" in columns:
+        return
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute("ALTER TABLE ingredients ADD COLUMN oz REAL")
+        for row in db.execute("SELECT rowid, measurement FROM ingredients").fetchall():
+            try:
+                oz = recipes.parse_amount(row["measurement"])
+            except ValueError:
+                continue
+            db.execute("UPDATE ingredients SET oz = ? WHERE rowid = ?", (oz, row["rowid"]))
+        _bump(db, "cocktails")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def _read_legacy_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading {path} for migration: {e}")
+        return None
+
+
+def migrate(db):
+    """Import the legacy JSON/txt files once, if they exist and haven't been imported yet."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        done = db.execute("SELECT value FROM ui_state WHERE key = 'migrated'").fetchone()
+        if done is None:
+            imported = []
+            config = _read_legacy_json(LEGACY_CONFIG_FILE)
+            if isinstance(config, dict):
+                _write_pump_config(db, config)
+                imported.append(LEGACY_CONFIG_FILE)
+            cocktails = _read_legacy_json(LEGACY_COCKTAILS_FILE)
+            if isinstance(cocktails, dict):
+                compiled, problems = recipes.compile_menu(cocktails)
+                for problem in problems:
+                    print(problem)
+                _write_cocktails(db, compiled)
+                imported.append(LEGACY_COCKTAILS_FILE)
+            for key, path in LEGACY_STATE_FILES.items():
+                try:
+                    with open(path, "r") as f:
+                        _write_state(db, key, f.read().strip())
+                    imported.append(path)
+                except OSError:
+                    pass
+            db.execute("INSERT INTO ui_state (key, value) VALUES ('migrated', ?)", (json.dumps(imported),))
+            if imported:
+                print(f"Imported {', '.join(imported)} into {DB_FILE}.")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def seed(path):
+    """
+    Create an empty store at `path`, already marked as migrated, so the
+    legacy files in the working directory are never imported into it
+    (benchmarks and other scratch stores).
+    """
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        db.executescript(SCHEMA)
+        db.execute("INSERT OR IGNORE INTO ui_state (key, value) VALUES ('migrated', '[]')")
+        db.commit()
+
+
+# ---------- Pumps ----------
+
+def _write_pump_config(db, config):
+    db.execute("DELETE FROM pumps")
+    db.executemany(
+        "INSERT INTO pumps (label, ingredient, position) VALUES (?, ?, ?)",
+        [(label, ingredient or "", position) for position, (label, ingredient) in enumerate(config.items())],
+    )
+    _bump(db, "pumps")
+
+
+def _pump_notes(config):
+    index = ingredient_index()
+    notes = []
+    for label, ingredient in config.items():
+        resolved = index.resolve(ingredient) if ingredient else None
+        if resolved and ingredients.normalize(resolved) != ingredients.normalize(ingredient):
+            notes.append(f"{label}: '{ingredient}' will be matched as {resolved}")
+    return notes
+
+
+def get_pump_config():
+    """{"Pump 1": "Vodka", ...} in pump order (the old pump_config.json)."""
+    rows = connect().execute("SELECT label, ingredient FROM pumps ORDER BY position").fetchall()
+    return {row["label"]: row["ingredient"] for row in rows}
+
+
+def save_pump_config(config):
+    """
+    Replace every pump assignment in one transaction. Returns notes on
+    ingredient names that were read as a different canonical name.
+    """
+    with transaction() as db:
+        _write_pump_config(db, config)
+    return _pump_notes(config)
+
+
+# ---------- Ingredients ----------
+
+def get_aliases():
+    """{alias: ingredient} saved in the store (on top of ingredients.ALIASES)."""
+    rows = connect().execute("SELECT alias, ingredient FROM ingredient_aliases ORDER BY alias").fetchall()
+    return {row["alias"]: row["ingredient"] for row in rows}
+
+
+def save_alias(alias, ingredient):
+    """Make `alias` resolve to `ingredient` from now on."""
+    with transaction() as db:
+        db.execute(
+            "INSERT INTO ingredient_aliases (alias, ingredient) VALUES (?, ?) "
+            "ON CONFLICT(alias) DO UPDATE SET ingredient = excluded.ingredient",
+            (alias.strip(), ingredient.strip()),
+        )
+        _bump(db, "aliases")
+
+
+def delete_alias(alias):
+    with transaction() as db:
+        db.execute("DELETE FROM ingredient_aliases WHERE alias = ?", (alias.strip(),))
+        _bump(db, "aliases")
+
+
+def ingredient_index():
+    """
+    The ingredients.IngredientIndex for the current pumps and aliases,
+    rebuilt only when either changes.
+    """
+    key = (DB_FILE, revision("pumps"), revision("aliases"))
+    if key != _ingredient_index["key"]:
+        index = ingredients.IngredientIndex(get_pump_config().values(), get_aliases())
+        _ingredient_index.update(key=key, index=index)
+    return _ingredient_index["index"]
+
+
+def _pump_problems(compiled):
+    """
+    Ingredients of the `compiled` recipes that no pump holds, and those that
+    will pour from a pump holding a differently named ingredient (matched
+    by alias or as a typo), described for the WebUI.
+    """
+    pumps = {}
+    index = ingredient_index()
+    for label, ingredient in get_pump_config().items():
+        if ingredient:
+            pumps.setdefault(index.key(ingredient), (label, ingredient))  # first pump wins, as in the pour plans
+    if not pumps:
+        return []
+    problems = []
+    for recipe in compiled:
+        for ingredient, oz in zip(recipe.ingredients, recipe.amounts):
+            if oz is None:
+                continue
+            pump = pumps.get(index.key(ingredient))
+            if pump:
+                label, pump_ingredient = pump
+                if ingredients.normalize(ingredient) != ingredients.normalize(pump_ingredient):
+                    problems.append(f"{recipe.name}: {ingredient} will pour from {label} ({pump_ingredient})")
+                continue
+            resolved = index.resolve(ingredient)
+            read_as = f" (read as {resolved})" if resolved and resolved != ingredient else ""
+            problems.append(f"{recipe.name}: no pump has {ingredient}{read_as}; it will be skipped")
+    return problems
+
+
+# ---------- Cocktails ----------
+
+def _insert_cocktail(db, recipe, position):
+    cursor = db.execute(
+        "INSERT INTO cocktails (safe_name, normal_name, fun_name, position, extra) VALUES (?, ?, ?, ?, ?)",
+        (safe_name(recipe.name), recipe.name, recipe.fun_name or None, position, json.dumps(recipe.extra)),
+    )
+    db.executemany(
+        "INSERT INTO ingredients (cocktail_id, position, name, measurement, oz) VALUES (?, ?, ?, ?, ?)",
+        [(cursor.lastrowid, i, name, measurement, oz)
+         for i, (name, measurement, oz) in enumerate(zip(recipe.ingredients, recipe.measurements, recipe.amounts))],
+    )
+
+
+def _write_cocktails(db, compiled):
+    db.execute("DELETE FROM ingredients")
+    db.execute("DELETE FROM cocktails")
+    seen = set()
+    for position, recipe in enumerate(compiled):
+        key = safe_name(recipe.name)
+        if key in seen:
+            print(f"Skipping duplicate cocktail '{recipe.name}'.")
+            continue
+        seen.add(key)
+        _insert_cocktail(db, recipe, position)
+    _bump(db, "cocktails")
+
+
+def _rows_to_recipes(db, rows):
+    if not rows:
+        return []
+    lines = {row["id"]: ([], [], []) for row in rows}
+    cursor = db.cursor()
+    cursor.row_factory = None  # plain tuples: this loop sees every ingredient line
+    if len(lines) == 1:
+        cursor.execute(
+            "SELECT cocktail_id, name, measurement, oz FROM ingredients WHERE cocktail_id = ? ORDER BY position",
+            (rows[0]["id"],),
+        )
+    else:
+        cursor.execute("SELECT cocktail_id, name, measurement, oz FROM ingredients ORDER BY cocktail_id, position")
+    for cocktail_id, name, measurement, oz in cursor:
+        line = lines.get(cocktail_id)
+        if line is not None:
+            line[0].append(name)
+            line[1].append(measurement)
+            line[2].append(oz)
+    return [
+        recipes.Recipe(row["normal_name"], row["fun_name"] or "", *lines[row["id"]],
+                       json.loads(row["extra"]) if row["extra"] != "{}" else None)
+        for row in rows
+    ]
+
+
+def get_recipes():
+    """Every cocktail as a compiled recipes.Recipe, in menu order (one consistent snapshot)."""
+    db = connect()
+    db.execute("BEGIN")
+    try:
+        rows = db.execute("SELECT * FROM cocktails ORDER BY position").fetchall()
+        return _rows_to_recipes(db, rows)
+    finally:
+        db.execute("COMMIT")
+
+
+def get_recipe(name):
+    """One compiled recipe by cocktail name or logo filename, or None."""
+    db = connect()
+    db.execute("BEGIN")
+    try:
+        rows = db.execute("SELECT * FROM cocktails WHERE safe_name = ?", (safe_name(name),)).fetchall()
+        found = _rows_to_recipes(db, rows)
+    finally:
+        db.execute("COMMIT")
+    return found[0] if found else None
+
+
+def get_cocktails():
+    """{"cocktails": [...]} in menu order, the same shape as the old cocktails.json."""
+    return {"cocktails": [recipe.as_dict() for recipe in get_recipes()]}
+
+
+def get_cocktail(name):
+    """One cocktail dict by name or logo filename, or None."""
+    recipe = get_recipe(name)
+    return recipe.as_dict() if recipe else None
+
+
+def save_cocktails(data):
+    """
+    Validate and replace the whole menu ({"cocktails": [...]}) in one
+    transaction. Cocktails that don't validate are left out. Returns the
+    list of problems found (rejected cocktails, unreadable measurements,
+    ingredients no pump holds);
+    raises ValueError if `data` isn't a menu at all.
+    """
+    if not isinstance(data, dict) or "cocktails" not in data:
+        raise ValueError(data.get("error", "no cocktails in menu") if isinstance(data, dict) else "no cocktails in menu")
+    compiled, problems = recipes.compile_menu(data)
+    problems.extend(_pump_problems(compiled))
+    with transaction() as db:
+        _write_cocktails(db, compiled)
+    return problems
+
+
+def save_cocktail(cocktail):
+    """
+    Validate and insert or update one cocktail (matched by safe name),
+    keeping its menu position. Returns its problems (see save_cocktails);
+    raises ValueError if it doesn't validate.
+    """
+    recipe = recipes.compile_cocktail(cocktail)
+    with transaction() as db:
+        row = db.execute("SELECT id, position FROM cocktails WHERE safe_name = ?", (safe_name(recipe.name),)).fetchone()
+        if row:
+            position = row["position"]
+            db.execute("DELETE FROM cocktails WHERE id = ?", (row["id"],))
+        else:
+            position = db.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM cocktails").fetchone()[0]
+        _insert_cocktail(db, recipe, position)
+        _bump(db, "cocktails")
+    return recipes.describe_problems(recipe) + _pump_problems([recipe])
+
+
+# ---------- Inventory ----------
+
+def get_inventory():
+    """{pump label: {"remaining_oz", "capacity_oz", "updated"}} for every tracked pump."""
+    rows = connect().execute("SELECT label, capacity_oz, remaining_oz, updated FROM inventory").fetchall()
+    return {
+        row["label"]: {"remaining_oz": row["remaining_oz"], "capacity_oz": row["capacity_oz"], "updated": row["updated"]}
+        for row in rows
+    }
+
+
+def set_inventory(label, remaining_oz, capacity_oz=None):
+    """Start tracking a pump, or record a refill: `remaining_oz` now behind it (bottle size optional)."""
+    with transaction() as db:
+        db.execute(
+            "INSERT INTO inventory (label, capacity_oz, remaining_oz, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(label) DO UPDATE SET remaining_oz = excluded.remaining_oz, "
+            "capacity_oz = COALESCE(excluded.capacity_oz, capacity_oz), updated = excluded.updated",
+            (label, capacity_oz, remaining_oz, time.time()),
+        )
+        _bump(db, "inventory")
+
+
+def untrack_inventory(label):
+    """Stop tracking what is left behind a pump."""
+    with transaction() as db:
+        db.execute("DELETE FROM inventory WHERE label = ?", (label,))
+        _bump(db, "inventory")
+
+
+def draw_inventory(amounts, keep_seconds):
+    """
+    Take {pump label: oz} out of the ledger in one transaction and log the
+    draws (log entries older than `keep_seconds` are pruned). Pumps that
+    aren't tracked are only logged. Remaining volumes never go below zero.
+    """
+    now = time.time()
+    amounts = {label: oz for label, oz in amounts.items() if oz > 0}
+    if not amounts:
+        return
+    with transaction() as db:
+        db.executemany(
+            "UPDATE inventory SET remaining_oz = MAX(remaining_oz - ?, 0), updated = ? WHERE label = ?",
+            [(oz, now, label) for label, oz in amounts.items()],
+        )
+        db.executemany("INSERT INTO inventory_log (ts, label, oz) VALUES (?, ?, ?)", [(now, label, oz) for label, oz in amounts.items()])
+        db.execute("DELETE FROM inventory_log WHERE ts < ?", (now - keep_seconds,))
+        _bump(db, "inventory")
+
+
+def inventory_draws(since):
+    """{pump label: {"oz", "first"}}: ounces drawn since the `since` timestamp and when the first of those draws was."""
+    rows = connect().execute(
+        "SELECT label, SUM(oz) AS oz, MIN(ts) AS first FROM inventory_log WHERE ts >= ? GROUP BY label", (since,)
+    ).fetchall()
+    return {row["label"]: {"oz": row["oz"], "first": row["first"]} for row in rows}
+
+
+# ---------- UI state ----------
+
+def _write_state(db, key, value):
+    db.execute(
+        "INSERT INTO ui_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, value),
+    )
+    _bump(db, "ui_state")
+
+
+def get_state(key, default=None):
+    row = connect().execute("SELECT value FROM ui_state WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def set_state(key, value):
+    with transaction() as db:
+        _write_state(db, key, value)
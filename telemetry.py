@@ -0,0 +1,153 @@
+# telemetry.py
+"""
+Per-pour telemetry.
+
+Every pump activation is recorded as a structured event:
+    {"ts", "kind", "drink_id", "source", "pump", "ingredient", "target_s", "actual_s"}
+Events go into a bounded in-memory ring buffer (for live metrics) and are
+appended to telemetry.jsonl in batches, so a busy night doesn't turn into
+one disk write per pump.
+
+serve_metrics() starts a small local HTTP endpoint (pour_service.py does
+this) for capacity planning:
+    GET /metrics        per-pump counts and busy time, drinks per hour, timing error
+    GET /events?n=100   the most recent raw events
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+TELEMETRY_FILE = os.getenv("TELEMETRY_FILE", "telemetry.jsonl")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 8765))
+RING_SIZE = 10000      # events kept in memory for metrics
+FLUSH_BATCH = 50       # write to disk once this many events are waiting
+FLUSH_INTERVAL = 30    # ...or at least this often (seconds)
+
+_lock = threading.Lock()
+_ring = deque(maxlen=RING_SIZE)
+_unflushed = deque(maxlen=RING_SIZE)
+_last_flush = time.time()
+
+
+def record(kind, pump, ingredient, target_s, actual_s, drink_id=None, source=None):
+    """Record one pump activation."""
+    event = {
+        "ts": time.time(),
+        "kind": kind,
+        "drink_id": drink_id,
+        "source": source,
+        "pump": pump,
+        "ingredient": ingredient,
+        "target_s": round(target_s, 4),
+        "actual_s": round(actual_s, 4),
+    }
+    with _lock:
+        _ring.append(event)
+        _unflushed.append(event)
+        due = len(_unflushed) >= FLUSH_BATCH or event["ts"] - _last_flush >= FLUSH_INTERVAL
+    if due:
+        flush()
+    return event
+
+
+def flush():
+    """Append every waiting event to TELEMETRY_FILE."""
+    global _last_flush
+    with _lock:
+        batch = list(_unflushed)
+        _unflushed.clear()
+        _last_flush = time.time()
+    if not batch:
+        return
+    try:
+        with open(TELEMETRY_FILE, "a") as f:
+            f.write("".join(json.dumps(event) + "\n" for event in batch))
+    except Exception as e:
+        print(f"Error writing telemetry to {TELEMETRY_FILE}: {e}")
+
+
+atexit.register(flush)
+
+
+def recent(n=100):
+    """The last `n` events, oldest first."""
+    with _lock:
+        return list(_ring)[-n:]
+
+
+def metrics(window=3600):
+    """Summary of the events in memory, with drinks per hour over the last `window` seconds."""
+    with _lock:
+        events = list(_ring)
+    now = time.time()
+    pumps = {}
+    drinks = set()
+    drinks_in_window = set()
+    sources = {}
+    errors = []
+    for event in events:
+        stats = pumps.setdefault(event["pump"], {"activations": 0, "busy_s": 0.0, "ingredient": None})
+        if event["kind"] == "pour":
+            stats["ingredient"] = event["ingredient"]
+        stats["activations"] += 1
+        stats["busy_s"] += event["actual_s"]
+        errors.append(abs(event["actual_s"] - event["target_s"]))
+        if event["kind"] == "pour" and event["drink_id"]:
+            if event["drink_id"] not in drinks:
+                sources[event["source"]] = sources.get(event["source"], 0) + 1
+            drinks.add(event["drink_id"])
+            if now - event["ts"] <= window:
+                drinks_in_window.add(event["drink_id"])
+    return {
+        "events": len(events),
+        "drinks": len(drinks),
+        "drinks_per_hour": len(drinks_in_window) * 3600 / window,
+        "drinks_by_source": sources,
+        "pumps": dict(sorted(pumps.items(), key=lambda item: -item[1]["busy_s"])),
+        "timing_error_s": {
+            "mean": sum(errors) / len(errors) if errors else 0.0,
+            "max": max(errors) if errors else 0.0,
+        },
+    }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            body = metrics()
+        elif url.path == "/events":
+            try:
+                n = int(parse_qs(url.query).get("n", ["100"])[0])
+            except ValueError:
+                n = 100
+            body = recent(n)
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # keep the console for pour messages
+
+
+def serve_metrics(port=METRICS_PORT):
+    """Start the metrics endpoint on 127.0.0.1:`port` in a background thread."""
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    except OSError as e:
+        print(f"Could not start metrics endpoint on port {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics available at http://127.0.0.1:{port}/metrics")
+    return server
@@ -0,0 +1,75 @@
+# timing.py
+"""
+Deadline-based timing for pump on/off control.
+
+Instead of back-to-back time.sleep() calls (which drift by however long the
+prints and GPIO calls in between take), every pump gets an absolute stop
+time on the monotonic clock. wait_until() sleeps most of the way to a
+deadline and spin-waits the last couple of milliseconds, so a busy Pi
+doesn't over-pour. TimingLog records the real on-time of every pump next
+to its target so the jitter can be measured.
+"""
+import time
+
+# How long before a deadline to stop sleeping and start spinning. Linux on a
+# Pi usually wakes up within 1-2 ms of the requested time.
+SPIN_THRESHOLD = 0.002
+
+
+def wait_until(deadline, clock=time.monotonic, sleep=time.sleep, cancel=None):
+    """
+    Block until `clock()` reaches `deadline`: coarse sleep, then spin.
+
+    If `cancel` (a threading.Event) is given, the coarse sleep waits on it
+    instead of calling `sleep`, and the function returns False as soon as
+    it is set; otherwise it returns True once the deadline is reached.
+    """
+    while True:
+        if cancel is not None and cancel.is_set():
+            return False
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return True
+        if remaining > SPIN_THRESHOLD:
+            if cancel is not None:
+                # Event.wait sleeps the same way but wakes up on cancel.
+                cancel.wait(remaining - SPIN_THRESHOLD)
+            else:
+                sleep(remaining - SPIN_THRESHOLD)
+
+
+class TimingLog:
+    """Actual vs target on-time for every pump activation in one run."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.records = []
+        self._open = {}
+
+    def pump_on(self, pump, target):
+        """Note that `pump` just turned on for `target` seconds; returns the on time."""
+        now = self.clock()
+        self._open[pump] = (now, target)
+        return now
+
+    def pump_off(self, pump):
+        """Note that `pump` just turned off; returns its record (or None if never started)."""
+        now = self.clock()
+        if pump not in self._open:
+            return None
+        on_time, target = self._open.pop(pump)
+        actual = now - on_time
+        record = {"pump": pump, "target": target, "actual": actual, "error": actual - target}
+        self.records.append(record)
+        return record
+
+    def summary(self):
+        """Mean and worst absolute error (seconds) over all finished activations."""
+        if not self.records:
+            return {"count": 0, "mean_error": 0.0, "max_error": 0.0}
+        errors = [abs(r["error"]) for r in self.records]
+        return {
+            "count": len(errors),
+            "mean_error": sum(errors) / len(errors),
+            "max_error": max(errors),
+        }
@@ -0,0 +1,99 @@
+# tween.py
+"""
+Frame-scheduled tweens for the kiosk UI.
+
+An animation is declared as a timed change of one named value (a logo's
+size, the carousel offset, ...) instead of running its own blocking loop:
+
+    tweens.start("single_size", 150, 220, 150)      # grow over 150 ms
+    tweens.sequence("single_size", 150, [(220, 150), (150, 150)], on_done=pour)
+
+The main loop calls update() once per frame and draws the scene from
+get(); any number of tweens run at the same time, events are handled every
+frame, and starting a tween on a name that is already animating replaces
+(interrupts) it. finish() jumps a tween to its end and runs its callback.
+"""
+import pygame
+
+
+def linear(t):
+    return t
+
+
+def ease_out(t):
+    """Fast start, gentle landing."""
+    return 1 - (1 - t) ** 2
+
+
+class Tween:
+    """One value moving from `start` to `end` over `duration` ms."""
+
+    def __init__(self, start, end, duration, started, easing=linear, on_done=None):
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.started = started
+        self.easing = easing
+        self.on_done = on_done
+
+    def progress(self, now):
+        if self.duration <= 0:
+            return 1.0
+        return min(max((now - self.started) / self.duration, 0.0), 1.0)
+
+    def value(self, now):
+        return self.start + (self.end - self.start) * self.easing(self.progress(now))
+
+
+class Tweens:
+    """All running tweens, advanced together once per frame."""
+
+    def __init__(self, clock=pygame.time.get_ticks):
+        self.clock = clock
+        self.tweens = {}
+        self.values = {}
+
+    def start(self, name, start, end, duration, easing=linear, on_done=None):
+        """Animate `name` from `start` to `end` over `duration` ms, interrupting any tween on it."""
+        self.tweens[name] = Tween(start, end, duration, self.clock(), easing, on_done)
+        self.values[name] = start
+
+    def sequence(self, name, start, steps, easing=linear, on_done=None):
+        """Chain tweens on `name`: from `start` through each (end, duration) in `steps`."""
+        end, duration = steps[0]
+        rest = steps[1:]
+        then = (lambda: self.sequence(name, end, rest, easing, on_done)) if rest else on_done
+        self.start(name, start, end, duration, easing, then)
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def set(self, name, value):
+        """Stop any tween on `name` (without its callback) and hold it at `value`."""
+        self.tweens.pop(name, None)
+        self.values[name] = value
+
+    def running(self, name=None):
+        """Whether `name` (or anything, if None) is animating."""
+        return name in self.tweens if name else bool(self.tweens)
+
+    def finish(self, name):
+        """Jump the tween on `name` to its end and run its callback (and any chained ones)."""
+        while name in self.tweens:
+            tween = self.tweens.pop(name)
+            self.values[name] = tween.end
+            if tween.on_done:
+                tween.on_done()
+
+    def update(self):
+        """Advance every tween to now and run callbacks of finished ones. True if anything moved."""
+        if not self.tweens:
+            return False
+        now = self.clock()
+        for name, tween in list(self.tweens.items()):
+            self.values[name] = tween.value(now)
+            if tween.progress(now) >= 1.0 and self.tweens.get(name) is tween:
+                del self.tweens[name]
+                if tween.on_done:
+                    tween.on_done()
+        return True